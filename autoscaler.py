@@ -0,0 +1,327 @@
+import bisect
+import time
+from collections import deque
+from threading import Thread
+from pod_scheduler import NODE_TOPOLOGY_KEY
+
+
+def estimate_nodes_needed(cpu_requests, node_capacity, min_nodes=0):
+    """Estimate how many nodes of node_capacity a set of pods needs
+
+    Uses best-fit decreasing over a sorted list of free capacities, so each pod
+    is placed with a binary search. Returns (nodes_needed, unfittable) where
+    unfittable counts pods larger than a whole node.
+    """
+    remaining = []  # Free CPU of each simulated node, kept sorted
+    unfittable = 0
+    for cpu_request in sorted(cpu_requests, reverse=True):
+        if cpu_request > node_capacity:
+            unfittable += 1
+            continue
+        position = bisect.bisect_left(remaining, cpu_request)
+        if position < len(remaining):
+            free = remaining.pop(position)
+        else:
+            free = node_capacity
+        bisect.insort(remaining, free - cpu_request)
+    return max(len(remaining), min_nodes), unfittable
+
+
+class Autoscaler:
+    """Adds nodes while pods are pending and removes nodes that stay idle
+
+    Each pass first tries to place pending pods on the existing nodes. Pods
+    still pending after scale_up_delay seconds are packed into hypothetical
+    nodes to size a single bulk scale-up. Nodes the autoscaler added are
+    removed again once they have been below scale_down_utilization for
+    scale_down_delay seconds and their pods fit on the remaining nodes. The
+    two delays, plus cooldowns after every scale-up and scale-down, keep the
+    cluster from flapping.
+    """
+
+    def __init__(self, scheduler, node_cpu_capacity=100, node_memory_capacity=None, node_labels=None,
+                 min_nodes=0, max_nodes=50, interval=10, scale_up_delay=10, scale_down_delay=300,
+                 scale_down_utilization=0.3, scale_up_cooldown=30, scale_down_cooldown=120,
+                 scale_down_repeat_cooldown=60, max_scale_down_per_pass=1, node_prefix="auto-node"):
+        self.scheduler = scheduler
+        self.pod_scheduler = scheduler.pod_scheduler
+        self.node_cpu_capacity = node_cpu_capacity
+        self.node_memory_capacity = node_memory_capacity
+        self.node_labels = dict(node_labels or {})  # Labels given to every node the autoscaler adds
+        self.min_nodes = min_nodes
+        self.max_nodes = max_nodes
+        self.interval = interval  # seconds between background passes
+        self.scale_up_delay = scale_up_delay  # seconds a pod must be pending before nodes are added for it
+        self.scale_down_delay = scale_down_delay  # seconds a node must stay underutilised before removal
+        self.scale_down_utilization = scale_down_utilization  # fraction of capacity requested (or used)
+        self.scale_up_cooldown = scale_up_cooldown  # seconds after a scale-up before the next one
+        self.scale_down_cooldown = scale_down_cooldown  # seconds after a scale-up before any scale-down
+        self.scale_down_repeat_cooldown = scale_down_repeat_cooldown  # seconds after a scale-down before the next
+        self.max_scale_down_per_pass = max_scale_down_per_pass
+        self.node_prefix = node_prefix
+        self.node_sequence = 0  # Number in the name of the last node added
+        self.managed_nodes = set()  # Nodes this autoscaler added and may remove again
+        self.underutilized_since = {}  # {node_id: time it was first seen below scale_down_utilization}
+        self.last_scale_up = 0.0
+        self.last_scale_down = 0.0
+        self.events = deque(maxlen=100)  # Recent scaling decisions
+        self.listeners = []  # Callables notified with ("added" | "removed", [node_ids])
+        self.running = False
+        self.autoscale_thread = None
+
+    def start(self):
+        """Start the background autoscaling thread"""
+        if self.running:
+            return
+        self.running = True
+        self.autoscale_thread = Thread(target=self._autoscale_loop, daemon=True)
+        self.autoscale_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.autoscale_thread:
+            self.autoscale_thread.join(1)
+
+    def add_listener(self, listener):
+        """Register a callable notified with ("added" | "removed", node_ids) after scaling"""
+        self.listeners.append(listener)
+
+    def _notify(self, event, node_ids):
+        for listener in self.listeners:
+            try:
+                listener(event, node_ids)
+            except Exception as e:
+                print(f"Error in autoscaler listener: {e}")
+
+    def _autoscale_loop(self):
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in autoscaler: {e}")
+            time.sleep(self.interval)
+
+    def _schedulable_demand(self, now, min_wait=None):
+        """Return CPU requests of pending pods that waited min_wait seconds and that new nodes could host
+
+        min_wait defaults to scale_up_delay. Also returns the fewest new nodes
+        the pods need because of node-level anti-affinity.
+        """
+        if min_wait is None:
+            min_wait = self.scale_up_delay
+        demand = []
+        node_anti_affinity_groups = {}  # {group: pods that need a node of their own}
+        label_anti_affinity_groups = set()  # Groups that can place only one more pod on the new nodes' domains
+        with self.pod_scheduler.lock:
+            for pod_id, cpu_request in self.pod_scheduler.pending_pods.items():
+                if now - self.pod_scheduler.pending_since.get(pod_id, now) < min_wait:
+                    continue
+                constraints = self.pod_scheduler.pod_constraints.get(pod_id)
+                if constraints:
+                    if not self._new_node_could_host(pod_id, constraints):
+                        continue
+                    group = constraints["group"]
+                    topology_key = constraints["anti_affinity"]
+                    if topology_key == NODE_TOPOLOGY_KEY:
+                        node_anti_affinity_groups[group] = node_anti_affinity_groups.get(group, 0) + 1
+                    elif topology_key:
+                        # Every new node shares the same labels, so they form one domain
+                        if group in label_anti_affinity_groups:
+                            continue
+                        label_anti_affinity_groups.add(group)
+                demand.append(cpu_request)
+        # Pods that must not share a node need at least one node each
+        min_nodes = max(node_anti_affinity_groups.values(), default=0)
+        return demand, min_nodes
+
+    def _new_node_could_host(self, pod_id, constraints):
+        """Check a pod's topology constraints against a new node carrying node_labels"""
+        scheduler = self.pod_scheduler
+        labels = self.node_labels
+        if any(labels.get(key) != value for key, value in constraints["node_selector"].items()):
+            return False  # New nodes would not carry the labels this pod needs
+
+        topology_key = constraints["affinity"]
+        if topology_key:
+            counts = scheduler._group_counts(pod_id, constraints["group"], topology_key)
+            # A new node is never one of the group's existing nodes, but may share a labelled domain
+            if counts and (topology_key == NODE_TOPOLOGY_KEY or labels.get(topology_key) not in counts):
+                return False
+
+        _, rejected, required_keys = scheduler._topology_filter(pod_id)
+        for topology_key in required_keys:
+            if topology_key == NODE_TOPOLOGY_KEY:
+                continue  # A new node is a domain of its own, so it is never rejected
+            domain = labels.get(topology_key)
+            if domain is None or domain in rejected.get(topology_key, ()):
+                return False
+        return True
+
+    def plan_scale_up(self, now=None):
+        """Return how many nodes to add for the current pending pods"""
+        if now is None:
+            now = time.time()
+        if now - self.last_scale_up < self.scale_up_cooldown:
+            return 0
+
+        demand, min_nodes = self._schedulable_demand(now)
+        if not demand:
+            return 0
+        nodes_needed, unfittable = estimate_nodes_needed(demand, self.node_cpu_capacity, min_nodes)
+        if unfittable:
+            print(f"Autoscaler: {unfittable} pending pods request more than {self.node_cpu_capacity} CPU and cannot be helped")
+        return max(0, min(nodes_needed, self.max_nodes - len(self.pod_scheduler.nodes)))
+
+    def _node_utilization(self, node_id, node_info):
+        """Fraction of a node's capacity requested by its pods, or measured in use if higher"""
+        allocated = node_info["cpu_capacity"] - node_info["cpu_available"]
+        measured = self.scheduler.usage_collector.get_cpu_usage(node_id) or 0
+        return max(allocated, measured) / node_info["cpu_capacity"] if node_info["cpu_capacity"] else 0.0
+
+    def plan_scale_down(self, now=None):
+        """Return managed nodes that have been idle long enough and whose pods fit elsewhere"""
+        if now is None:
+            now = time.time()
+
+        with self.pod_scheduler.lock:
+            nodes = self.pod_scheduler.nodes
+            for node_id in list(self.underutilized_since):
+                if node_id not in nodes:
+                    del self.underutilized_since[node_id]
+            for node_id in self.managed_nodes & set(nodes):
+                if self._node_utilization(node_id, nodes[node_id]) < self.scale_down_utilization:
+                    self.underutilized_since.setdefault(node_id, now)
+                else:
+                    self.underutilized_since.pop(node_id, None)
+
+            if now - self.last_scale_up < self.scale_down_cooldown:
+                return []
+            if now - self.last_scale_down < self.scale_down_repeat_cooldown:
+                return []
+            # Pods a scale-up could help block scale-down; pods no new node can host do not
+            demand, _ = self._schedulable_demand(now, min_wait=0)
+            if any(cpu_request <= self.node_cpu_capacity for cpu_request in demand):
+                return []
+
+            # Simulated free CPU of the nodes that stay, to check the drained pods fit
+            available = {
+                node_id: node_info["cpu_available"] for node_id, node_info in nodes.items()
+                if node_id not in self.pod_scheduler.unschedulable_nodes
+            }
+            removable = []
+            # Emptiest nodes first, since they have the fewest pods to move
+            candidates = sorted(
+                (node_id for node_id, since in self.underutilized_since.items() if now - since >= self.scale_down_delay),
+                key=lambda node_id: nodes[node_id]["cpu_available"], reverse=True
+            )
+            for node_id in candidates:
+                if len(removable) >= self.max_scale_down_per_pass or len(nodes) - len(removable) <= self.min_nodes:
+                    break
+                pods = nodes[node_id]["pods"]
+                if any(pod_id in self.pod_scheduler.pod_constraints for pod_id in pods):
+                    continue  # Constrained pods may have nowhere else to go
+                simulated = dict(available)
+                simulated.pop(node_id, None)
+                if self._fits(pods, simulated):
+                    removable.append(node_id)
+                    available = simulated
+            return removable
+
+    def _fits(self, pod_ids, available):
+        """Best-fit the pods into a simulated view of free CPU, updating it; False if any pod has no room"""
+        for pod_id in sorted(pod_ids, key=self.pod_scheduler.get_pod_cpu_request, reverse=True):
+            cpu_request = self.pod_scheduler.get_pod_cpu_request(pod_id)
+            fitting = [(free, node_id) for node_id, free in available.items() if free >= cpu_request]
+            if not fitting:
+                return False
+            free, node_id = min(fitting)
+            available[node_id] = free - cpu_request
+        return True
+
+    def run_once(self, dry_run=False):
+        """Run one autoscaling pass
+
+        Returns a dictionary with the nodes added and removed (or that would be,
+        with dry_run) and the pending pod latency at the time of the pass.
+        """
+        now = time.time()
+        if not dry_run:
+            # Capacity freed since the last pass is used before buying more
+            self.pod_scheduler.schedule_pending_pods()
+
+        scale_up = self.plan_scale_up(now)
+        added = []
+        if scale_up:
+            specs = []
+            sequence = self.node_sequence
+            for _ in range(scale_up):
+                sequence += 1
+                while f"{self.node_prefix}-{sequence}" in self.pod_scheduler.nodes:
+                    sequence += 1
+                specs.append({
+                    "node_id": f"{self.node_prefix}-{sequence}",
+                    "cpu_capacity": self.node_cpu_capacity,
+                    "memory_capacity": self.node_memory_capacity,
+                    "labels": self.node_labels
+                })
+            if dry_run:
+                added = [spec["node_id"] for spec in specs]
+            else:
+                self.node_sequence = sequence
+                results = self.scheduler.add_nodes(specs)
+                added = [node_id for node_id, (success, _) in results.items() if success]
+                self.managed_nodes.update(added)
+                self.last_scale_up = now
+                self._record("scale_up", added, now)
+                self._notify("added", added)
+
+        removed = []
+        if not scale_up:
+            removable = self.plan_scale_down(now)
+            if dry_run:
+                removed = removable
+            else:
+                for node_id in removable:
+                    # Removing the node drains it: its pods are rescheduled onto the remaining nodes
+                    success, message = self.scheduler.remove_node(node_id)
+                    if success:
+                        removed.append(node_id)
+                        self.managed_nodes.discard(node_id)
+                        self.underutilized_since.pop(node_id, None)
+                    else:
+                        print(f"Autoscaler could not remove node {node_id}: {message}")
+                if removed:
+                    self.last_scale_down = now
+                    self._record("scale_down", removed, now)
+                    self._notify("removed", removed)
+
+        return {
+            "added": added,
+            "removed": removed,
+            "time_to_schedule": self.pod_scheduler.get_pending_latency_stats()
+        }
+
+    def _record(self, action, node_ids, now):
+        stats = self.pod_scheduler.get_pending_latency_stats()
+        self.events.append({
+            "time": now,
+            "action": action,
+            "nodes": node_ids,
+            "pending_pods": stats["pending_count"],
+            "pending_oldest_wait": stats["pending_oldest_wait"]
+        })
+        print(f"Autoscaler {action.replace('_', ' ')}: {', '.join(node_ids)} "
+              f"({stats['pending_count']} pods pending, oldest waiting {stats['pending_oldest_wait']:.1f}s)")
+
+    def get_status(self):
+        """Return managed nodes, recent scaling events and pod time-to-schedule"""
+        return {
+            "node_count": len(self.pod_scheduler.nodes),
+            "managed_nodes": sorted(self.managed_nodes),
+            "min_nodes": self.min_nodes,
+            "max_nodes": self.max_nodes,
+            "last_scale_up": self.last_scale_up or None,
+            "last_scale_down": self.last_scale_down or None,
+            "events": list(self.events),
+            "time_to_schedule": self.pod_scheduler.get_pending_latency_stats()
+        }
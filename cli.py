@@ -1,18 +1,36 @@
 import argparse
-import requests
-import json
-import time
-import os
-import sys
+from pod_scheduler import PRIORITY_CLASSES
 
 # Base URL for API
 BASE_URL = "http://localhost:5000"
 
+def http():
+    """Import requests only when a command talks to the server, so --help stays fast"""
+    import requests
+    return requests
+
+def parse_labels(pairs):
+    """Turn repeated key=value arguments into a dictionary"""
+    labels = {}
+    for pair in pairs or []:
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise SystemExit(f"Expected key=value, got: {pair}")
+        labels[key] = value
+    return labels
+
 def add_node(args):
     """Add a node to the cluster"""
-    response = requests.post(f"{BASE_URL}/add_node", json={
+    labels = parse_labels(args.labels)
+    if args.zone:
+        labels["zone"] = args.zone
+    if args.rack:
+        labels["rack"] = args.rack
+    response = http().post(f"{BASE_URL}/add_node", json={
         "node_id": args.node_id,
-        "cpu_capacity": args.cpu_capacity
+        "cpu_capacity": args.cpu_capacity,
+        "memory_capacity": args.memory_capacity,
+        "labels": labels
     })
     
     if response.status_code == 201:
@@ -22,7 +40,7 @@ def add_node(args):
 
 def list_nodes(args):
     """List all nodes in the cluster with their status"""
-    response = requests.get(f"{BASE_URL}/list_nodes")
+    response = http().get(f"{BASE_URL}/list_nodes")
     
     if response.status_code == 200:
         nodes = response.json()
@@ -38,16 +56,35 @@ def list_nodes(args):
             print(f"\nNode: {node_id} [{health_symbol} {health_status}]")
             print(f"├── Container ID: {node_info.get('container_id', 'N/A')[:12]}")
             print(f"├── CPU Capacity: {node_info.get('cpu_capacity', 'N/A')}")
+            labels = node_info.get('labels') or {}
+            print(f"├── Labels: {', '.join(f'{k}={v}' for k, v in labels.items()) or 'None'}")
             print(f"├── CPU Available: {node_info.get('cpu_available', 'N/A')}")
+            print(f"├── Suspicion (phi): {node_info.get('suspicion', 'N/A')}")
             print(f"└── Pods: {', '.join(node_info.get('pods', [])) or 'None'}")
     else:
         print(f"✗ Error: Could not retrieve node list")
 
 def schedule_pod(args):
     """Schedule a pod on the cluster"""
-    response = requests.post(f"{BASE_URL}/schedule_pod", json={
+    constraints = {}
+    if args.group:
+        constraints["group"] = args.group
+    if args.node_selector:
+        constraints["node_selector"] = parse_labels(args.node_selector)
+    if args.affinity:
+        constraints["affinity"] = args.affinity
+    if args.anti_affinity:
+        constraints["anti_affinity"] = args.anti_affinity
+    if args.spread:
+        constraints["spread"] = {"topology_key": args.spread, "max_skew": args.max_skew}
+
+    response = http().post(f"{BASE_URL}/schedule_pod", json={
         "pod_id": args.pod_id,
-        "cpu_request": args.cpu_request
+        "cpu_request": args.cpu_request,
+        "priority_class": args.priority_class,
+        "command": args.pod_command,
+        "ttl": args.ttl,
+        "constraints": constraints or None
     })
     
     if response.status_code == 201:
@@ -56,6 +93,56 @@ def schedule_pod(args):
     else:
         print(f"✗ Error: {response.json().get('error')}")
 
+def delete_pod(args):
+    """Delete a pod from the cluster"""
+    response = http().post(f"{BASE_URL}/delete_pod", json={"pod_id": args.pod_id})
+    
+    if response.status_code == 200:
+        print(f"✓ Success: {response.json().get('message')}")
+    else:
+        print(f"✗ Error: {response.json().get('error')}")
+
+def pod_status(args):
+    """Show runtime status of pods that run a command"""
+    params = {"pod_id": args.pod_id} if args.pod_id else {}
+    response = http().get(f"{BASE_URL}/get_pod_status", params=params)
+    
+    if response.status_code == 200:
+        data = response.json()
+        pods = data.get("pods", {})
+        if not pods:
+            print("No pods with commands found.")
+            return
+        
+        print("\n=== Pod Status ===")
+        for pod_id, info in pods.items():
+            time_to_running = info.get("time_to_running")
+            print(f"\nPod: {pod_id} [{info.get('status')}]")
+            print(f"├── Node: {info.get('node') or 'None'}")
+            print(f"├── Restarts: {info.get('restarts')}")
+            print(f"└── Time to running: {f'{time_to_running:.3f}s' if time_to_running is not None else 'N/A'}")
+    else:
+        print(f"✗ Error: Could not retrieve pod status")
+
+def autoscaler_status(args):
+    """Show autoscaler state and how long pods wait to be scheduled"""
+    response = http().get(f"{BASE_URL}/autoscaler_status")
+    
+    if response.status_code == 200:
+        status = response.json()
+        latency = status.get("time_to_schedule", {})
+        print("\n=== Autoscaler ===")
+        print(f"├── Nodes: {status.get('node_count')} (min {status.get('min_nodes')}, max {status.get('max_nodes')})")
+        print(f"├── Managed nodes: {', '.join(status.get('managed_nodes', [])) or 'None'}")
+        print(f"├── Pending pods: {latency.get('pending_count', 0)}, "
+              f"oldest waiting {latency.get('pending_oldest_wait', 0.0):.1f}s")
+        print(f"└── Time to schedule: mean {latency.get('placed_mean_wait', 0.0):.3f}s, "
+              f"p95 {latency.get('placed_p95_wait', 0.0):.3f}s over {latency.get('placed_count', 0)} pods")
+        for event in status.get("events", [])[-5:]:
+            print(f"    {event['action']}: {', '.join(event['nodes'])} ({event['pending_pods']} pods pending)")
+    else:
+        print(f"✗ Error: Could not retrieve autoscaler status")
+
 def main():
     parser = argparse.ArgumentParser(description="Kubernetes-like Cluster CLI")
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
@@ -65,6 +152,12 @@ def main():
     node_parser.add_argument("node_id", help="Unique ID for the node")
     node_parser.add_argument("--cpu", dest="cpu_capacity", type=int, default=100, 
                             help="CPU capacity of the node (default: 100)")
+    node_parser.add_argument("--memory", dest="memory_capacity", type=int, default=None,
+                            help="Memory limit of the node container in MB (default: unlimited)")
+    node_parser.add_argument("--zone", default=None, help="Zone the node belongs to")
+    node_parser.add_argument("--rack", default=None, help="Rack the node belongs to")
+    node_parser.add_argument("--label", dest="labels", action="append", metavar="KEY=VALUE",
+                            help="Additional topology label (repeatable)")
     
     # List nodes command
     list_parser = subparsers.add_parser("list-nodes", help="List all nodes in the cluster")
@@ -74,6 +167,36 @@ def main():
     pod_parser.add_argument("pod_id", help="Unique ID for the pod")
     pod_parser.add_argument("--cpu", dest="cpu_request", type=int, default=10, 
                            help="CPU request for the pod (default: 10)")
+    pod_parser.add_argument("--priority-class", dest="priority_class", default=None,
+                           choices=list(PRIORITY_CLASSES),
+                           help="Priority class of the pod (default: default)")
+    pod_parser.add_argument("--command", dest="pod_command", default=None,
+                           help="Shell command the pod runs on its node")
+    pod_parser.add_argument("--ttl", type=float, default=None,
+                           help="Seconds the pod runs after placement before it completes")
+    pod_parser.add_argument("--group", default=None,
+                           help="Group the pod belongs to, e.g. its service, for affinity and spread")
+    pod_parser.add_argument("--node-selector", dest="node_selector", action="append", metavar="KEY=VALUE",
+                           help="Only place on nodes with this label (repeatable)")
+    pod_parser.add_argument("--affinity", default=None, metavar="TOPOLOGY_KEY",
+                           help="Place in a domain (node, zone, rack, ...) already running the group")
+    pod_parser.add_argument("--anti-affinity", dest="anti_affinity", default=None, metavar="TOPOLOGY_KEY",
+                           help="Never share a domain (node, zone, rack, ...) with another pod of the group")
+    pod_parser.add_argument("--spread", default=None, metavar="TOPOLOGY_KEY",
+                           help="Spread the group evenly across this domain")
+    pod_parser.add_argument("--max-skew", dest="max_skew", type=int, default=1,
+                           help="Allowed difference in group pods between domains with --spread (default: 1)")
+    
+    # Delete pod command
+    delete_parser = subparsers.add_parser("delete-pod", help="Delete a pod from the cluster")
+    delete_parser.add_argument("pod_id", help="ID of the pod to delete")
+    
+    # Pod status command
+    status_parser = subparsers.add_parser("pod-status", help="Show runtime status of pods")
+    status_parser.add_argument("pod_id", nargs="?", default=None, help="Only show this pod")
+    
+    # Autoscaler status command
+    autoscaler_parser = subparsers.add_parser("autoscaler-status", help="Show autoscaler state and time-to-schedule")
     
     # Parse arguments
     args = parser.parse_args()
@@ -84,6 +207,12 @@ def main():
         list_nodes(args)
     elif args.command == "schedule-pod":
         schedule_pod(args)
+    elif args.command == "delete-pod":
+        delete_pod(args)
+    elif args.command == "pod-status":
+        pod_status(args)
+    elif args.command == "autoscaler-status":
+        autoscaler_status(args)
     else:
         parser.print_help()
 
@@ -0,0 +1,84 @@
+import heapq
+import itertools
+import time
+from threading import Thread, Condition
+
+
+class ExpiryEngine:
+    """Fires a callback for each pod exactly when its deadline passes
+
+    Deadlines live in a min-heap, so the background thread sleeps until the
+    earliest one instead of polling every pod. Cancelling or rescheduling a
+    pod only updates a dictionary; stale heap entries are skipped when popped.
+    """
+
+    def __init__(self, on_expire):
+        self.on_expire = on_expire  # Called with pod_id when its deadline passes
+        self.heap = []  # (deadline, sequence, pod_id)
+        self.deadlines = {}  # {pod_id: current deadline}
+        self.sequence = itertools.count()  # Tie-breaker so pod_ids are never compared
+        self.condition = Condition()
+        self.running = False
+        self.expiry_thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.expiry_thread = Thread(target=self._run, daemon=True)
+        self.expiry_thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.expiry_thread:
+            self.expiry_thread.join(1)
+
+    def schedule(self, pod_id, deadline):
+        """Expire a pod at the given time.time() deadline, replacing any earlier one"""
+        with self.condition:
+            self.deadlines[pod_id] = deadline
+            heapq.heappush(self.heap, (deadline, next(self.sequence), pod_id))
+            # Wake the thread in case this deadline is earlier than the one it sleeps towards
+            self.condition.notify()
+
+    def cancel(self, pod_id):
+        with self.condition:
+            return self.deadlines.pop(pod_id, None) is not None
+
+    def has_deadline(self, pod_id):
+        return pod_id in self.deadlines
+
+    def pop_expired(self, now=None):
+        """Remove and return pods whose deadline is at or before now"""
+        if now is None:
+            now = time.time()
+        expired = []
+        with self.condition:
+            while self.heap and self.heap[0][0] <= now:
+                deadline, _, pod_id = heapq.heappop(self.heap)
+                if self.deadlines.get(pod_id) == deadline:
+                    del self.deadlines[pod_id]
+                    expired.append(pod_id)
+        return expired
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    return
+                # Drop cancelled entries so the wait targets a live deadline
+                while self.heap and self.deadlines.get(self.heap[0][2]) != self.heap[0][0]:
+                    heapq.heappop(self.heap)
+                timeout = self.heap[0][0] - time.time() if self.heap else None
+                if timeout is None or timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+
+            # Call back without holding the condition so callbacks may schedule or cancel
+            for pod_id in self.pop_expired():
+                try:
+                    self.on_expire(pod_id)
+                except Exception as e:
+                    print(f"Error expiring pod {pod_id}: {e}")
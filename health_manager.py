@@ -1,24 +1,39 @@
 import time
+from threading import Lock
 from health_monitor import HealthMonitor
 from node_manager import NodeManager
 
 class HealthManager:
-    def __init__(self, node_manager):
+    def __init__(self, node_manager, autostart=True, detector_options=None):
         self.node_manager = node_manager
-        self.health_monitor = HealthMonitor()
+        # detector_options tune the failure detector, e.g. phi_threshold or acceptable_pause
+        self.health_monitor = HealthMonitor(autostart=autostart, **(detector_options or {}))
         self.failed_nodes = set()
         self.pods_to_reschedule = {}  # Dictionary to track pods that need rescheduling
         self.pod_scheduler = None
+        self.last_health_status = {}  # Result of the most recent full health sweep
+        self.last_health_check = 0.0
+        # {node_id: status} for nodes whose status changed in a sweep, until taken by pop_health_changes
+        self.health_changes = {}
+        self.health_changes_lock = Lock()
         
     def set_pod_scheduler(self, pod_scheduler):
         """Set the pod scheduler reference"""
         self.pod_scheduler = pod_scheduler
         
-    def get_node_health_status(self):
-        """Return health status for all nodes"""
+    def get_node_health_status(self, max_age=None):
+        """Return health status for all nodes
+
+        With max_age (seconds), the result of a sweep at most that old is reused
+        instead of checking every container and heartbeat again.
+        """
+        if max_age is not None and time.time() - self.last_health_check <= max_age:
+            return self.last_health_status
+
         nodes = self.node_manager.list_nodes()
         health_status = {}
         newly_failed_nodes = set()  # Track newly failed nodes in this check
+        current_time = time.time()
         
         for node_id, node_info in nodes.items():
             container_id = node_info.get("container_id", "")
@@ -34,11 +49,8 @@ class HealthManager:
                 
             # Then check heartbeat status
             if node_id in self.health_monitor.nodes_health:
-                last_heartbeat = self.health_monitor.nodes_health[node_id]
-                current_time = time.time()
-                
-                # Check if node is considered healthy (heartbeat within timeout)
-                if current_time - last_heartbeat <= self.health_monitor.heartbeat_timeout:
+                # Check if node is considered healthy (suspicion level below the detector threshold)
+                if self.health_monitor.is_available(node_id, current_time):
                     health_status[node_id] = "Healthy"
                 else:
                     health_status[node_id] = "Unhealthy"
@@ -53,8 +65,22 @@ class HealthManager:
         # Check for pods that need rescheduling from newly failed nodes
         if newly_failed_nodes:
             self._mark_pods_for_rescheduling(newly_failed_nodes)
+
+        with self.health_changes_lock:
+            for node_id, status in health_status.items():
+                if self.last_health_status.get(node_id) != status:
+                    self.health_changes[node_id] = status
+
+        self.last_health_status = health_status
+        self.last_health_check = current_time
                 
         return health_status
+
+    def pop_health_changes(self):
+        """Return and clear the node statuses that changed since the last call"""
+        with self.health_changes_lock:
+            changes, self.health_changes = self.health_changes, {}
+        return changes
     
     def _mark_pods_for_rescheduling(self, failed_node_ids):
         """Mark pods on failed nodes for rescheduling"""
@@ -99,9 +125,7 @@ class HealthManager:
                     self.pods_to_reschedule[node_id] = node_pods_info
             
             # Remove node from health monitor
-            with self.health_monitor.lock:
-                if node_id in self.health_monitor.nodes_health:
-                    del self.health_monitor.nodes_health[node_id]
+            self.health_monitor.forget_node(node_id)
             
             # Add to failed nodes list
             if node_id not in self.failed_nodes:
@@ -111,9 +135,17 @@ class HealthManager:
         else:
             return False, f"Node {node_id} not found"
     
+    def get_node_usage(self):
+        """Return the latest resource usage nodes reported with their heartbeats"""
+        return dict(self.health_monitor.node_usage)
+
+    def get_suspicion_levels(self):
+        """Return the failure detector's suspicion level (phi) for each node"""
+        return self.health_monitor.get_suspicion_levels()
+
     def register_node_with_health_monitor(self, node_id):
         """Register a new node with the health monitor"""
-        self.health_monitor.receive_heartbeat(node_id)
+        self.health_monitor.register_node(node_id)
         
     def get_health_monitor(self):
         """Return the health monitor instance"""
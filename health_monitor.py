@@ -1,20 +1,185 @@
+import json
+import math
+import selectors
+import socket
 import time
 from threading import Thread, Lock
+from ring_buffer import RingBuffer
 
 class HealthMonitor:
-    def __init__(self):
+    """Phi-accrual failure detector fed by node heartbeats
+
+    Instead of a fixed timeout, each node's heartbeat inter-arrival times are
+    kept in a small ring buffer and the time since the last heartbeat is turned
+    into a suspicion level (phi). A phi of 1 means a ~10% chance the node is
+    still alive, 2 means ~1%, 3 means ~0.1% and so on. Nodes whose phi exceeds
+    phi_threshold are considered failed.
+
+    The defaults are at least as tolerant as the old fixed 10 s timeout: a node
+    sending perfectly regular 5 s heartbeats is declared failed after about
+    12 s of silence, and a node with a more jittery history later still.
+    """
+
+    def __init__(self, phi_threshold=8.0, window_size=100, min_samples=3,
+                 min_std_deviation=1.0, acceptable_pause=2.0, heartbeat_timeout=10, autostart=True):
         self.nodes_health = {}  # {node_id: last_heartbeat_time}
-        self.heartbeat_timeout = 10  # seconds
+        # Only these nodes are tracked; heartbeats from anyone else (e.g. a removed node's
+        # container that is still shutting down) are dropped
+        self.registered_nodes = set()
+        # Registered nodes that have not sent a heartbeat yet; the gap until their first one is not a sample
+        self.awaiting_first_heartbeat = set()
+        self.heartbeat_timeout = heartbeat_timeout  # seconds, used until a node has enough heartbeat history
+        self.phi_threshold = phi_threshold
+        self.window_size = window_size  # Inter-arrival samples kept per node
+        self.min_samples = min_samples
+        self.min_std_deviation = min_std_deviation  # seconds, avoids over-confidence on very regular heartbeats
+        self.acceptable_pause = acceptable_pause  # seconds of GC/GIL pause tolerated on top of the mean
+        self.intervals = {}  # {node_id: RingBuffer of heartbeat inter-arrival times}
+        self.node_usage = {}  # {node_id: latest resource usage reported with a heartbeat}
         self.lock = Lock()
         self.running = True
+        self.listener_socket = None
+        self.listener_thread = None
+        self.monitor_thread = None
         
-        # Start monitoring thread
+        if autostart:
+            self.start()
+
+    def start(self):
+        """Start the monitoring thread"""
+        if self.monitor_thread is not None:
+            return
         self.monitor_thread = Thread(target=self._monitor_nodes)
         self.monitor_thread.start()
     
-    def receive_heartbeat(self, node_id):
+    def register_node(self, node_id):
+        """Start monitoring a node
+
+        Silence is measured from registration, but the interval up to the
+        node's first heartbeat is not an inter-arrival sample.
+        """
         with self.lock:
+            self.registered_nodes.add(node_id)
+            self.awaiting_first_heartbeat.add(node_id)
             self.nodes_health[node_id] = time.time()
+
+    def receive_heartbeat(self, node_id, usage=None):
+        with self.lock:
+            if node_id in self.registered_nodes:
+                self._record_heartbeat(node_id, time.time(), usage)
+
+    def receive_heartbeats(self, heartbeats):
+        """Record a batch of (node_id, usage) heartbeats under a single lock acquisition"""
+        now = time.time()
+        with self.lock:
+            for node_id, usage in heartbeats:
+                if node_id in self.registered_nodes:
+                    self._record_heartbeat(node_id, now, usage)
+
+    def _record_heartbeat(self, node_id, now, usage):
+        last_heartbeat = self.nodes_health.get(node_id)
+        if node_id in self.awaiting_first_heartbeat:
+            self.awaiting_first_heartbeat.discard(node_id)
+        elif last_heartbeat is not None:
+            if node_id not in self.intervals:
+                self.intervals[node_id] = RingBuffer(self.window_size)
+            self.intervals[node_id].append(now - last_heartbeat)
+        self.nodes_health[node_id] = now
+        if usage:
+            self.node_usage[node_id] = usage
+
+    def start_listener(self, host="0.0.0.0", port=9999, max_batch=1024):
+        """Start receiving heartbeats sent by heartbeat_agent.py over UDP
+
+        Returns the (host, port) the listener is bound to; pass port=0 to let
+        the OS pick a free port.
+        """
+        if self.listener_socket is not None:
+            return self.listener_socket.getsockname()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind((host, port))
+        sock.setblocking(False)
+        self.listener_socket = sock
+
+        self.listener_thread = Thread(target=self._receive_heartbeats, args=(max_batch,), daemon=True)
+        self.listener_thread.start()
+        return sock.getsockname()
+
+    def _receive_heartbeats(self, max_batch):
+        """Drain queued datagrams in batches and record them together"""
+        selector = selectors.DefaultSelector()
+        selector.register(self.listener_socket, selectors.EVENT_READ)
+
+        while self.running:
+            if not selector.select(timeout=0.5):
+                continue
+
+            heartbeats = []
+            for _ in range(max_batch):
+                try:
+                    datagram, _address = self.listener_socket.recvfrom(65535)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    # Socket was closed by stop()
+                    return
+                for line in datagram.splitlines():
+                    try:
+                        message = json.loads(line)
+                        heartbeats.append((message["node_id"], message.get("usage")))
+                    except (ValueError, KeyError, TypeError):
+                        print(f"Ignoring malformed heartbeat: {line[:100]!r}")
+
+            if heartbeats:
+                self.receive_heartbeats(heartbeats)
+
+        selector.close()
+
+    def forget_node(self, node_id):
+        """Stop monitoring a node and drop all its heartbeat state"""
+        with self.lock:
+            self.registered_nodes.discard(node_id)
+            self.awaiting_first_heartbeat.discard(node_id)
+            self.nodes_health.pop(node_id, None)
+            self.intervals.pop(node_id, None)
+            self.node_usage.pop(node_id, None)
+
+    def phi(self, node_id, now=None):
+        """Return the suspicion level for a node (0 means no suspicion)"""
+        last_heartbeat = self.nodes_health.get(node_id)
+        if last_heartbeat is None:
+            return 0.0
+        if now is None:
+            now = time.time()
+        elapsed = now - last_heartbeat
+
+        window = self.intervals.get(node_id)
+        if window is None or len(window) < self.min_samples:
+            # Not enough history yet: scale the fixed timeout onto the phi range
+            return self.phi_threshold * elapsed / self.heartbeat_timeout
+
+        mean = window.mean() + self.acceptable_pause
+        std_deviation = max(math.sqrt(window.variance()), self.min_std_deviation)
+
+        # Logistic approximation of the normal CDF, as used by Cassandra/Akka
+        y = (elapsed - mean) / std_deviation
+        y = max(-20.0, min(20.0, y))  # Keep exp() in range; phi saturates well before this
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if elapsed > mean:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def is_available(self, node_id, now=None):
+        """Return True while a node's suspicion level is below the threshold"""
+        return self.phi(node_id, now) < self.phi_threshold
+
+    def get_suspicion_levels(self):
+        """Return the current phi for every monitored node"""
+        now = time.time()
+        with self.lock:
+            return {node_id: self.phi(node_id, now) for node_id in self.nodes_health}
     
     def _monitor_nodes(self):
         while self.running:
@@ -22,8 +187,8 @@ class HealthMonitor:
                 current_time = time.time()
                 failed_nodes = []
                 
-                for node_id, last_heartbeat in self.nodes_health.items():
-                    if current_time - last_heartbeat > self.heartbeat_timeout:
+                for node_id in self.nodes_health:
+                    if not self.is_available(node_id, current_time):
                         failed_nodes.append(node_id)
                 
                 # Handle failed nodes
@@ -35,4 +200,8 @@ class HealthMonitor:
     
     def stop(self):
         self.running = False
-        self.monitor_thread.join()
\ No newline at end of file
+        if self.monitor_thread is not None:
+            self.monitor_thread.join()
+        if self.listener_thread is not None:
+            self.listener_thread.join(1)
+            self.listener_socket.close()
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Heartbeat agent that runs inside a node container
+
+Sends a UDP heartbeat to the HealthMonitor listener every few seconds. Each
+datagram carries one JSON object per line, so a single agent can also stand in
+for many nodes at once when load testing the receiver:
+
+    python heartbeat_agent.py --node-id node-1 --host 127.0.0.1 --port 9999
+    python heartbeat_agent.py --node-id sim --nodes 5000 --interval 0.5
+
+Settings default to the NODE_ID, HEARTBEAT_HOST, HEARTBEAT_PORT and
+HEARTBEAT_INTERVAL environment variables that NodeManager sets on containers.
+Only the standard library is used so the agent runs on the bare node image.
+"""
+import argparse
+import json
+import os
+import socket
+import time
+
+MAX_DATAGRAM_SIZE = 60000  # bytes, stays under the UDP payload limit
+
+
+def read_usage():
+    """Return a small resource usage snapshot of this container, if available"""
+    usage = {}
+    try:
+        with open("/proc/loadavg") as f:
+            usage["load_1m"] = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+
+    # cgroup v2 first, then v1
+    for path in ("/sys/fs/cgroup/memory.current", "/sys/fs/cgroup/memory/memory.usage_in_bytes"):
+        try:
+            with open(path) as f:
+                usage["memory_bytes"] = int(f.read().strip())
+            break
+        except (OSError, ValueError):
+            continue
+
+    return usage
+
+
+def build_datagrams(node_ids, report_usage):
+    """Encode one heartbeat per node, packing as many as fit into each datagram"""
+    now = time.time()
+    usage = read_usage() if report_usage else None
+    datagrams = []
+    current = []
+    size = 0
+    for node_id in node_ids:
+        message = {"node_id": node_id, "ts": now}
+        if usage:
+            message["usage"] = usage
+        line = json.dumps(message, separators=(",", ":")).encode() + b"\n"
+        if current and size + len(line) > MAX_DATAGRAM_SIZE:
+            datagrams.append(b"".join(current))
+            current = []
+            size = 0
+        current.append(line)
+        size += len(line)
+    if current:
+        datagrams.append(b"".join(current))
+    return datagrams
+
+
+def run(node_ids, host, port, interval, report_usage=True, count=None):
+    """Send heartbeats until stopped (or for count rounds)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rounds = 0
+    try:
+        while count is None or rounds < count:
+            for datagram in build_datagrams(node_ids, report_usage):
+                try:
+                    sock.sendto(datagram, (host, port))
+                except OSError as e:
+                    # The monitor may not be up yet; keep trying on the next round
+                    print(f"Heartbeat send failed: {e}")
+            rounds += 1
+            time.sleep(interval)
+    finally:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send node heartbeats to the health monitor over UDP")
+    parser.add_argument("--node-id", default=os.environ.get("NODE_ID"), help="ID of the node (default: $NODE_ID)")
+    parser.add_argument("--host", default=os.environ.get("HEARTBEAT_HOST", "127.0.0.1"),
+                        help="Health monitor host (default: $HEARTBEAT_HOST or 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("HEARTBEAT_PORT", 9999)),
+                        help="Health monitor UDP port (default: $HEARTBEAT_PORT or 9999)")
+    parser.add_argument("--interval", type=float, default=float(os.environ.get("HEARTBEAT_INTERVAL", 5)),
+                        help="Seconds between heartbeats (default: 5)")
+    parser.add_argument("--nodes", type=int, default=1,
+                        help="Simulate this many nodes named <node-id>-<n> (for load testing)")
+    parser.add_argument("--no-usage", dest="report_usage", action="store_false",
+                        help="Do not piggyback resource usage on heartbeats")
+    args = parser.parse_args()
+
+    if not args.node_id:
+        parser.error("--node-id or NODE_ID is required")
+
+    if args.nodes > 1:
+        node_ids = [f"{args.node_id}-{i}" for i in range(args.nodes)]
+    else:
+        node_ids = [args.node_id]
+
+    run(node_ids, args.host, args.port, args.interval, args.report_usage)
+
+
+if __name__ == "__main__":
+    main()
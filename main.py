@@ -22,6 +22,7 @@ def main():
     for i in range(2):
         node_id = f"node-{i}"
         scheduler.register_node(node_id, cpu_capacity=100)
+        health_monitor.register_node(node_id)
         nodes[node_id] = Node(node_id, cpu_capacity=100, health_monitor=health_monitor)
     
     print("\n=== Initial Cluster Status ===")
@@ -1,21 +1,54 @@
-import docker
+import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event
+
+NODE_IMAGE = "kube_sim_node"  # Built from node.Dockerfile, runs heartbeat_agent.py
+CPU_UNITS_PER_CORE = 100  # A node with cpu_capacity 100 gets one core's worth of CPU time
 
 class NodeManager:
-    def __init__(self):
+    def __init__(self, heartbeat_address=None, connect_timeout=5, use_docker=True):
         self.nodes = {}
+        # (host, port) of the HealthMonitor UDP listener; when set, node containers run the heartbeat agent
+        self.heartbeat_address = heartbeat_address
+        self.connect_timeout = connect_timeout  # seconds to wait for Docker before simulating nodes
+        self.client = None
+        self._docker_available = False
+        self._docker_ready = Event()
+        if not use_docker:
+            # Every node is simulated, even if a Docker daemon is reachable
+            self._docker_ready.set()
+            return
+        # Importing the Docker SDK and pinging the daemon is slow, so it happens off the caller's thread
+        Thread(target=self._connect_docker, daemon=True).start()
+
+    def _connect_docker(self):
         try:
-            self.client = docker.from_env()
+            import docker
+            client = docker.from_env(timeout=self.connect_timeout)
             # Test the connection
-            self.client.ping()
-            self.docker_available = True
+            client.ping()
+            self.client = client
+            self._docker_available = True
         except Exception as e:
             print(f"Docker client initialization failed: {e}")
-            self.docker_available = False
-            self.client = None
+        finally:
+            self._docker_ready.set()
+
+    @property
+    def docker_available(self):
+        """Whether Docker is usable, waiting up to connect_timeout for the background connection"""
+        self._docker_ready.wait(self.connect_timeout)
+        return self._docker_available
 
-    def add_node(self, node_id, cpu_capacity):
-        """Launch a Docker container to represent a node or simulate if Docker is unavailable"""
+    def add_node(self, node_id, cpu_capacity, memory_capacity=None, labels=None):
+        """Launch a Docker container to represent a node or simulate if Docker is unavailable
+
+        The container gets cgroup limits matching the node's capacity:
+        cpu_capacity / CPU_UNITS_PER_CORE cores and, if given, memory_capacity MB.
+        Topology labels (zone, rack, ...) are recorded and set as container labels.
+        """
+        labels = dict(labels or {})
         # Check if node already exists
         if node_id in self.nodes:
             return False, f"Node {node_id} already exists"
@@ -26,26 +59,37 @@ class NodeManager:
             self.nodes[node_id] = {
                 "container_id": f"sim-container-{node_id}",
                 "cpu_capacity": cpu_capacity,
+                "memory_capacity": memory_capacity,
                 "cpu_available": cpu_capacity,
-                "pods": []
+                "pods": [],
+                "labels": labels
             }
             success = True
             message = f"simulated-{node_id}"
         else:
             # Docker is available, try to create the container
             try:
-                container = self.client.containers.run(
-                    "ubuntu", 
-                    command="sleep infinity",
-                    detach=True,
-                    name=f"kube_sim_{node_id}",
-                    remove=True
-                )
+                limits = self._resource_limits(cpu_capacity, memory_capacity)
+                limits["labels"] = {f"kube_sim.{key}": str(value) for key, value in labels.items()}
+                if self.heartbeat_address:
+                    container = self._run_agent_container(node_id, limits)
+                else:
+                    container = self.client.containers.run(
+                        "ubuntu", 
+                        command="sleep infinity",
+                        detach=True,
+                        name=f"kube_sim_{node_id}",
+                        remove=True,
+                        **limits
+                    )
                 self.nodes[node_id] = {
                     "container_id": container.id,
                     "cpu_capacity": cpu_capacity,
+                    "memory_capacity": memory_capacity,
                     "cpu_available": cpu_capacity,
-                    "pods": []
+                    "pods": [],
+                    "labels": labels,
+                    "heartbeat_agent": bool(self.heartbeat_address)
                 }
                 success = True
                 message = container.id
@@ -57,14 +101,66 @@ class NodeManager:
                 self.nodes[node_id] = {
                     "container_id": f"sim-container-{node_id}",
                     "cpu_capacity": cpu_capacity,
+                    "memory_capacity": memory_capacity,
                     "cpu_available": cpu_capacity,
-                    "pods": []
+                    "pods": [],
+                    "labels": labels
                 }
                 success = True
                 message = f"simulated-{node_id} (Docker error: {str(e)[:50]}...)"
 
         return success, message
 
+    def add_nodes(self, node_specs, max_workers=8):
+        """Launch several nodes at once
+
+        node_specs is a list of dictionaries with add_node's arguments. Container
+        starts are slow, so they run concurrently. Returns {node_id: (success, message)}.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda spec: self.add_node(**spec), node_specs)
+            return {spec["node_id"]: result for spec, result in zip(node_specs, results)}
+
+    def _resource_limits(self, cpu_capacity, memory_capacity):
+        """Translate node capacity into docker run cgroup options"""
+        cores = cpu_capacity / CPU_UNITS_PER_CORE
+        host_cores = os.cpu_count() or 1
+        if cores > host_cores:
+            # Docker refuses a CPU limit above the host's cores, which would turn the node into a simulation
+            print(f"Node CPU capacity {cpu_capacity} exceeds the host's {host_cores} cores, "
+                  f"limiting its container to {host_cores} cores")
+            cores = host_cores
+        limits = {"nano_cpus": int(cores * 1e9)}
+        if memory_capacity:
+            limits["mem_limit"] = f"{memory_capacity}m"
+        return limits
+
+    def _run_agent_container(self, node_id, limits):
+        """Start a node container that reports its own heartbeats over UDP"""
+        import docker
+        try:
+            self.client.images.get(NODE_IMAGE)
+        except docker.errors.ImageNotFound:
+            print(f"Building node image {NODE_IMAGE} from node.Dockerfile")
+            self.client.images.build(path=os.path.dirname(os.path.abspath(__file__)),
+                                     dockerfile="node.Dockerfile", tag=NODE_IMAGE)
+
+        host, port = self.heartbeat_address
+        return self.client.containers.run(
+            NODE_IMAGE,
+            detach=True,
+            name=f"kube_sim_{node_id}",
+            remove=True,
+            environment={
+                "NODE_ID": node_id,
+                "HEARTBEAT_HOST": host,
+                "HEARTBEAT_PORT": str(port)
+            },
+            # Lets the agent reach a monitor running on the Docker host
+            extra_hosts={"host.docker.internal": "host-gateway"},
+            **limits
+        )
+
     def list_nodes(self):
         return self.nodes
         
@@ -74,6 +170,7 @@ class NodeManager:
         if not self.docker_available or container_id.startswith("sim-"):
             return True
             
+        import docker
         try:
             # Try to get the container and check its status
             container = self.client.containers.get(container_id)
@@ -95,6 +192,7 @@ class NodeManager:
         
         # If using Docker and not a simulated container
         if self.docker_available and not container_id.startswith("sim-"):
+            import docker
             try:
                 # Try to stop and remove the container
                 container = self.client.containers.get(container_id)
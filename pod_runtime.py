@@ -0,0 +1,353 @@
+import os
+import queue
+import shlex
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from collections import deque
+from threading import Thread, Lock
+
+FINAL_STATUSES = ("Succeeded", "Failed", "Terminated")
+
+
+def _shell_command(command):
+    """Run a pod command as one sh script, the same way on every backend
+
+    Compound commands (a && b, a; b) run in full and the script's PID is the pod's.
+    """
+    return f"exec sh -c {shlex.quote(command)}"
+
+
+class SubprocessBackend:
+    """Runs pod commands as processes on the scheduler host, for nodes without a real container
+
+    This is NOT a sandbox: the command runs with the scheduler's user and can
+    reach its files and network. It is only used when PodRuntime is created
+    with allow_host_commands. Each pod gets its own scratch working directory,
+    an empty environment and shell resource limits, which contain mistakes but
+    not a hostile command.
+    """
+
+    def __init__(self, memory_limit_mb=512, max_open_files=256):
+        self.memory_limit_mb = memory_limit_mb
+        self.max_open_files = max_open_files
+
+    def launch(self, pod_id, node_id, command):
+        workdir = tempfile.mkdtemp(prefix="pod-")
+        limits = f"ulimit -v {self.memory_limit_mb * 1024}; ulimit -n {self.max_open_files}; ulimit -c 0"
+        process = subprocess.Popen(
+            f"{limits}; {_shell_command(command)}",
+            shell=True,
+            cwd=workdir,
+            env={"PATH": "/usr/local/bin:/usr/bin:/bin", "HOME": workdir, "POD_ID": str(pod_id)},
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True  # So stopping a pod does not signal the scheduler
+        )
+        return {"process": process, "workdir": workdir}
+
+    def poll(self, handle):
+        """Return the exit code, or None while the process is running"""
+        exit_code = handle["process"].poll()
+        if exit_code is not None:
+            shutil.rmtree(handle["workdir"], ignore_errors=True)
+        return exit_code
+
+    def stop(self, handle):
+        process = handle["process"]
+        if process.poll() is None:
+            # Signal the pod's whole session so children of a compound command stop too
+            self._signal(process, signal.SIGTERM)
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._signal(process, signal.SIGKILL)
+                process.wait()
+        shutil.rmtree(handle["workdir"], ignore_errors=True)
+
+    def _signal(self, process, signum):
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+class DockerExecBackend:
+    """Runs pod commands with docker exec inside the node's container"""
+
+    def __init__(self, node_manager):
+        self.node_manager = node_manager
+        self.api = node_manager.client.api  # One low-level client (and connection pool) for all execs
+
+    def launch(self, pod_id, node_id, command):
+        container_id = self.node_manager.nodes[node_id]["container_id"]
+        # Record the pod's PID inside the container so it can be stopped later
+        pid_file = f"/tmp/pod-{pod_id}.pid"
+        wrapped = f"echo $$ > {shlex.quote(pid_file)}; {_shell_command(command)}"
+        exec_id = self.api.exec_create(container_id, ["sh", "-c", wrapped])["Id"]
+        self.api.exec_start(exec_id, detach=True)
+        return {"container_id": container_id, "exec_id": exec_id, "pid_file": pid_file}
+
+    def poll(self, handle):
+        try:
+            info = self.api.exec_inspect(handle["exec_id"])
+        except Exception:
+            # The container is gone, so the pod is too
+            return -1
+        if info.get("Running"):
+            return None
+        return info.get("ExitCode", -1)
+
+    def stop(self, handle):
+        try:
+            kill = f"kill $(cat {shlex.quote(handle['pid_file'])}) 2>/dev/null"
+            exec_id = self.api.exec_create(handle["container_id"], ["sh", "-c", kill])["Id"]
+            self.api.exec_start(exec_id)
+        except Exception as e:
+            print(f"Error stopping pod process in container {handle['container_id'][:12]}: {e}")
+
+
+class PodRuntime:
+    """Launches, tracks, restarts and reaps the processes behind scheduled pods
+
+    The runtime listens to PodScheduler placement events: when a pod with a
+    command is bound to a node its command is started there, and when it is
+    unbound (rescheduling, preemption, migration) the process is stopped. Work
+    is done on a single background thread so scheduling never waits on Docker.
+    Records of pods that finished (succeeded, failed or were terminated) are
+    kept for finished_retention seconds so their status can still be read.
+    """
+
+    def __init__(self, node_manager, max_restarts=3, restart_backoff=1.0, poll_interval=0.5,
+                 allow_host_commands=False, finished_retention=300):
+        self.node_manager = node_manager
+        # Commands of pods on simulated nodes run on the scheduler host only if this is set
+        self.allow_host_commands = allow_host_commands
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff  # seconds, doubled after each restart
+        self.poll_interval = poll_interval
+        self.subprocess_backend = SubprocessBackend()
+        self.docker_backend = None
+        self.pods = {}  # {pod_id: runtime record}
+        self.active = set()  # Pods with a process to poll or a restart due; the only ones _reap visits
+        self.finished = deque()  # (finished_at, pod_id) in finishing order, for aging out records
+        self.finished_retention = finished_retention  # seconds a finished pod's record is kept
+        self.time_to_running = deque(maxlen=1000)  # Recent submission-to-running latencies
+        self.actions = queue.Queue()  # ("launch" | "stop" | "terminate", pod_id, node_id)
+        self.finish_callbacks = []  # Called with (pod_id, status) when a pod exits for good
+        self.lock = Lock()
+        self.running = False
+        self.worker_thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.worker_thread = Thread(target=self._run, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.worker_thread:
+            self.worker_thread.join(1)
+        with self.lock:
+            for record in self.pods.values():
+                if record["handle"] is not None:
+                    record["backend"].stop(record["handle"])
+
+    def add_finish_callback(self, callback):
+        self.finish_callbacks.append(callback)
+
+    def submit(self, pod_id, command):
+        """Register the command a pod runs; it starts once the pod is bound to a node"""
+        with self.lock:
+            self.pods[pod_id] = {
+                "command": command,
+                "node": None,
+                "status": "Pending",
+                "backend": None,
+                "handle": None,
+                "restarts": 0,
+                "exit_code": None,
+                "submitted_at": time.time(),
+                "running_at": None,
+                "next_restart_at": None,
+                "finished_at": None
+            }
+
+    def on_placement(self, event, pod_id, node_id):
+        """PodScheduler placement listener"""
+        if pod_id not in self.pods:
+            return
+        self.actions.put(("launch" if event == "bound" else "stop", pod_id, node_id))
+
+    def terminate(self, pod_id):
+        """Stop a pod's process for good because the pod was deleted or completed"""
+        if pod_id in self.pods:
+            self.actions.put(("terminate", pod_id, None))
+
+    def _backend_for(self, node_id):
+        node_info = self.node_manager.nodes.get(node_id, {})
+        if self.node_manager.docker_available and not node_info.get("container_id", "sim-").startswith("sim-"):
+            if self.docker_backend is None:
+                self.docker_backend = DockerExecBackend(self.node_manager)
+            return self.docker_backend
+        if self.allow_host_commands:
+            return self.subprocess_backend
+        return None
+
+    def _run(self):
+        while self.running:
+            try:
+                action, pod_id, node_id = self.actions.get(timeout=self.poll_interval)
+                with self.lock:
+                    if action == "launch":
+                        self._launch(pod_id, node_id)
+                    elif action == "stop":
+                        self._stop(pod_id, node_id)
+                    else:
+                        self._terminate(pod_id)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Error in pod runtime: {e}")
+
+            with self.lock:
+                self._reap()
+
+    def _launch(self, pod_id, node_id):
+        record = self.pods[pod_id]
+        if record["handle"] is not None:
+            self._stop(pod_id, record["node"])
+        record["node"] = node_id
+        record["backend"] = self._backend_for(node_id)
+        if record["backend"] is None:
+            print(f"Not starting pod {pod_id}: node {node_id} has no container and host commands are disabled")
+            self._finish(pod_id, record, "Failed")
+            return
+        try:
+            record["handle"] = record["backend"].launch(pod_id, node_id, record["command"])
+        except Exception as e:
+            print(f"Failed to start pod {pod_id} on node {node_id}: {e}")
+            self._finish(pod_id, record, "Failed")
+            return
+        record["status"] = "Running"
+        record["finished_at"] = None
+        self.active.add(pod_id)
+        if record["running_at"] is None:
+            record["running_at"] = time.time()
+            self.time_to_running.append(record["running_at"] - record["submitted_at"])
+            print(f"Pod {pod_id} running on node {node_id} "
+                  f"{record['running_at'] - record['submitted_at']:.3f}s after submission")
+
+    def _stop(self, pod_id, node_id):
+        record = self.pods.get(pod_id)
+        if record is None or record["node"] != node_id:
+            return
+        if record["handle"] is not None:
+            record["backend"].stop(record["handle"])
+            record["handle"] = None
+        record["next_restart_at"] = None
+        if record["status"] in ("Running", "Restarting"):
+            record["status"] = "Pending"
+
+    def _terminate(self, pod_id):
+        record = self.pods.get(pod_id)
+        if record is None:
+            return
+        if record["handle"] is not None:
+            record["backend"].stop(record["handle"])
+            record["handle"] = None
+        record["next_restart_at"] = None
+        self._finish(pod_id, record, record["status"] if record["status"] in FINAL_STATUSES else "Terminated")
+
+    def _finish(self, pod_id, record, status):
+        """Give a pod its final status and schedule its record for removal"""
+        record["status"] = status
+        self.active.discard(pod_id)
+        if record["finished_at"] is None:
+            record["finished_at"] = time.time()
+            self.finished.append((record["finished_at"], pod_id))
+
+    def _age_out(self, now):
+        """Drop records of pods that finished more than finished_retention seconds ago"""
+        while self.finished and now - self.finished[0][0] >= self.finished_retention:
+            finished_at, pod_id = self.finished.popleft()
+            record = self.pods.get(pod_id)
+            # Skip records that were relaunched or replaced by a resubmitted pod since
+            if record is not None and record["finished_at"] == finished_at and record["status"] in FINAL_STATUSES:
+                del self.pods[pod_id]
+
+    def _reap(self):
+        """Collect exited pod processes, restart failed ones with backoff and age out finished ones"""
+        now = time.time()
+        self._age_out(now)
+        for pod_id in list(self.active):
+            record = self.pods.get(pod_id)
+            if record is None or (record["handle"] is None and record["next_restart_at"] is None):
+                self.active.discard(pod_id)
+                continue
+
+            if record["next_restart_at"] is not None and now >= record["next_restart_at"]:
+                record["next_restart_at"] = None
+                self._launch(pod_id, record["node"])
+                continue
+
+            if record["handle"] is None:
+                continue
+            exit_code = record["backend"].poll(record["handle"])
+            if exit_code is None:
+                continue
+
+            record["handle"] = None
+            record["exit_code"] = exit_code
+            if exit_code == 0:
+                self._finish(pod_id, record, "Succeeded")
+            elif record["restarts"] < self.max_restarts:
+                record["restarts"] += 1
+                record["status"] = "Restarting"
+                record["next_restart_at"] = now + self.restart_backoff * 2 ** (record["restarts"] - 1)
+                print(f"Pod {pod_id} exited with code {exit_code}, restart {record['restarts']}/{self.max_restarts}")
+                continue
+            else:
+                self._finish(pod_id, record, "Failed")
+
+            print(f"Pod {pod_id} finished with status {record['status']} (exit code {exit_code})")
+            for callback in self.finish_callbacks:
+                try:
+                    callback(pod_id, record["status"])
+                except Exception as e:
+                    print(f"Error in pod finish callback: {e}")
+
+    def get_pod_status(self, pod_id=None):
+        """Return status, node, restarts and time-to-running for one pod or all pods"""
+        with self.lock:
+            if pod_id is not None:
+                records = {pod_id: self.pods[pod_id]} if pod_id in self.pods else {}
+            else:
+                records = dict(self.pods)
+            return {
+                pid: {
+                    "status": record["status"],
+                    "node": record["node"],
+                    "restarts": record["restarts"],
+                    "exit_code": record["exit_code"],
+                    "time_to_running": (record["running_at"] - record["submitted_at"])
+                    if record["running_at"] else None
+                }
+                for pid, record in records.items()
+            }
+
+    def get_time_to_running_stats(self):
+        """Summarise submission-to-running latency over recently started pods"""
+        with self.lock:
+            latencies = sorted(self.time_to_running)
+        return {
+            "count": len(latencies),
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            "max": latencies[-1] if latencies else 0.0
+        }
@@ -1,58 +1,571 @@
+import bisect
+import functools
+import time
+from collections import deque, OrderedDict
+from threading import RLock
+
+# Priority classes a pod can be submitted with; higher values may preempt lower ones
+PRIORITY_CLASSES = {
+    "system-critical": 1000,
+    "high": 100,
+    "default": 0,
+    "batch": -100,
+}
+DEFAULT_PRIORITY_CLASS = "default"
+
+# Topology key that refers to the node itself rather than to one of its labels
+NODE_TOPOLOGY_KEY = "node"
+# Keys a pod's topology constraints may contain
+CONSTRAINT_KEYS = ("group", "node_selector", "affinity", "anti_affinity", "spread")
+
+
+def synchronized(method):
+    """Run a PodScheduler method while holding the scheduler lock"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class PodScheduler:
     def __init__(self):
         self.nodes = {}  # Dictionary to track nodes and their resource availability
         self.pod_assignments = {}  # Dictionary to track which node each pod is assigned to
         self.pod_requests = {}  # Dictionary to track CPU requests of each pod
         self.pending_pods = {}  # Dictionary to track pods waiting for available nodes
+        self.pod_priorities = {}  # Dictionary to track the priority value of each pod
+        self.preemption_index = {}  # {node_id: sorted list of (priority, pod_id)} for victim search
+        self.priority_nodes = {}  # {priority: {node_id: pods of that priority on the node}}, to find victim nodes
+        self.pending_since = {}  # Dictionary to track when each pending pod entered the queue
+        self.pending_wait_times = deque(maxlen=1000)  # Recent queue wait times of pods that got placed
+        self.placement_mode = "requests"  # "requests" packs on CPU requests, "usage" also respects measured usage
+        self.usage_provider = None  # Callable returning measured CPU units in use on a node, or None
+        self.placement_listeners = []  # Callables notified with (event, pod_id, node_id) on bind/unbind
+        # Background threads (repair, rebalancer, pod expiry) change placements concurrently with requests
+        self.lock = RLock()
+        self.unschedulable_nodes = set()  # Nodes excluded from placement, e.g. because they are unhealthy
+        # Equivalence-class cache: {cpu_request: sorted list of (cpu_available, node_id) of nodes that fit}.
+        # Pods of a shape seen before are placed by taking the head of the list; only nodes whose
+        # capacity or schedulability change are re-indexed.
+        self.shape_cache = OrderedDict()
+        self.shape_cache_size = 64  # Distinct request shapes kept, least recently used are dropped
+        self.indexed_available = {}  # {node_id: cpu_available as currently stored in shape_cache lists}
+        # Topology: node labels (e.g. zone, rack) and per-pod placement constraints.
+        # Constraints are checked against these indexes and counts, never by scanning pods.
+        self.label_index = {}  # {label_key: {label_value: set of node_ids}}
+        self.pod_constraints = {}  # {pod_id: validated constraints, see validate_constraints}
+        self.group_domain_counts = {}  # {group: {topology_key: {domain: pods of the group bound there}}}
+        self.pod_domains = {}  # {pod_id: (group, [(topology_key, domain), ...])} for bound grouped pods
+        self.verbose = False  # Dump every node's pod list after each placement; O(nodes), for debugging only
         
-    def register_node(self, node_id, cpu_capacity):
-        """Add a node to the scheduler"""
+    @synchronized
+    def register_node(self, node_id, cpu_capacity, labels=None):
+        """Add a node to the scheduler
+
+        labels maps topology keys such as "zone" or "rack" to the node's value for them.
+        """
+        labels = dict(labels or {})
+        if NODE_TOPOLOGY_KEY in labels:
+            raise ValueError(f"'{NODE_TOPOLOGY_KEY}' is reserved and cannot be used as a node label")
         self.nodes[node_id] = {
             "cpu_capacity": cpu_capacity,
             "cpu_available": cpu_capacity,
-            "pods": []
+            "pods": [],
+            "labels": labels
         }
+        for key, value in labels.items():
+            self.label_index.setdefault(key, {}).setdefault(value, set()).add(node_id)
+        self.preemption_index[node_id] = []
+        self._reindex_node(node_id)
+
+    @synchronized
+    def deregister_node(self, node_id):
+        """Remove a node from the scheduler and return the pods that were on it"""
+        node_info = self.nodes.pop(node_id, None)
+        for priority, _ in self.preemption_index.pop(node_id, []):
+            self._count_priority(node_id, priority, -1)
+        self.unschedulable_nodes.discard(node_id)
+        self._reindex_node(node_id)
+        if node_info is None:
+            return []
+        for key, value in node_info["labels"].items():
+            domain_nodes = self.label_index[key][value]
+            domain_nodes.discard(node_id)
+            if not domain_nodes:
+                del self.label_index[key][value]
+        return node_info["pods"].copy()
+
+    @synchronized
+    def set_node_schedulable(self, node_id, schedulable):
+        """Include or exclude a node from placement without touching its pods"""
+        if schedulable == (node_id not in self.unschedulable_nodes):
+            return
+        if schedulable:
+            self.unschedulable_nodes.discard(node_id)
+        else:
+            self.unschedulable_nodes.add(node_id)
+        self._reindex_node(node_id)
+
+    def _count_priority(self, node_id, priority, delta):
+        """Keep priority_nodes in step with the preemption index"""
+        holders = self.priority_nodes.setdefault(priority, {})
+        holders[node_id] = holders.get(node_id, 0) + delta
+        if not holders[node_id]:
+            del holders[node_id]
+            if not holders:
+                del self.priority_nodes[priority]
+
+    def _reindex_node(self, node_id):
+        """Bring a single node's entries in the shape cache up to date"""
+        old_available = self.indexed_available.pop(node_id, None)
+        node_info = self.nodes.get(node_id)
+        new_available = None
+        if node_info is not None and node_id not in self.unschedulable_nodes:
+            new_available = node_info["cpu_available"]
+            self.indexed_available[node_id] = new_available
+
+        for cpu_request, candidates in self.shape_cache.items():
+            if old_available is not None and old_available >= cpu_request:
+                position = bisect.bisect_left(candidates, (old_available, node_id))
+                if position < len(candidates) and candidates[position][1] == node_id:
+                    del candidates[position]
+            if new_available is not None and new_available >= cpu_request:
+                bisect.insort(candidates, (new_available, node_id))
+
+    def _candidates_for(self, cpu_request):
+        """Return the cached best-fit ordering for a request shape, building it on first use"""
+        candidates = self.shape_cache.get(cpu_request)
+        if candidates is not None:
+            self.shape_cache.move_to_end(cpu_request)
+            return candidates
+
+        candidates = sorted(
+            (cpu_available, node_id)
+            for node_id, cpu_available in self.indexed_available.items()
+            if cpu_available >= cpu_request
+        )
+        self.shape_cache[cpu_request] = candidates
+        if len(self.shape_cache) > self.shape_cache_size:
+            self.shape_cache.popitem(last=False)
+        return candidates
+
+    def add_placement_listener(self, listener):
+        """Register a callable notified with ("bound" | "unbound", pod_id, node_id)"""
+        self.placement_listeners.append(listener)
+
+    def _notify(self, event, pod_id, node_id):
+        for listener in self.placement_listeners:
+            try:
+                listener(event, pod_id, node_id)
+            except Exception as e:
+                print(f"Error in placement listener: {e}")
+
+    def set_usage_provider(self, usage_provider, placement_mode="usage"):
+        """Feed measured node CPU usage into placement decisions"""
+        self.usage_provider = usage_provider
+        self.placement_mode = placement_mode
+
+    def resolve_priority(self, priority_class):
+        """Translate a priority class name into its numeric priority"""
+        if priority_class is None:
+            priority_class = DEFAULT_PRIORITY_CLASS
+        if priority_class not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority_class}")
+        return PRIORITY_CLASSES[priority_class]
+
+    def get_pod_group(self, pod_id):
+        """Return the topology group a pod belongs to, or None"""
+        return self.pod_constraints.get(pod_id, {}).get("group")
+
+    def get_pod_priority(self, pod_id):
+        """Return the numeric priority of a pod"""
+        return self.pod_priorities.get(pod_id, PRIORITY_CLASSES[DEFAULT_PRIORITY_CLASS])
+
+    def validate_constraints(self, constraints):
+        """Check a pod's topology constraints and return them in normalised form
+
+        constraints is a dictionary with any of:
+            group: name shared by related pods, e.g. the replicas of a service
+            node_selector: {label_key: value} the node must carry
+            affinity: topology key; place in a domain already running pods of the group
+            anti_affinity: topology key; never share a domain with another pod of the group
+            spread: {"topology_key": key, "max_skew": n}; keep the group's pod count per
+                domain within n of the least loaded domain
+        The topology key "node" means the node itself; any other key is a node label.
+        """
+        if not constraints:
+            return None
+        unknown = set(constraints) - set(CONSTRAINT_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown constraint(s): {', '.join(sorted(unknown))}")
+
+        normalised = {"node_selector": dict(constraints.get("node_selector") or {})}
+        for key in ("group", "affinity", "anti_affinity"):
+            normalised[key] = constraints.get(key)
+        spread = constraints.get("spread")
+        if spread:
+            if "topology_key" not in spread:
+                raise ValueError("spread constraint needs a topology_key")
+            max_skew = int(spread.get("max_skew", 1))
+            if max_skew < 1:
+                raise ValueError("spread max_skew must be at least 1")
+            spread = {"topology_key": spread["topology_key"], "max_skew": max_skew}
+        normalised["spread"] = spread
+
+        if not normalised["group"] and (normalised["affinity"] or normalised["anti_affinity"] or spread):
+            raise ValueError("affinity, anti_affinity and spread constraints need a group")
+        return normalised
+
+    def _domain_of(self, node_id, topology_key):
+        """Return the domain a node belongs to for a topology key, or None if it has no such label"""
+        if topology_key == NODE_TOPOLOGY_KEY:
+            return node_id
+        return self.nodes[node_id]["labels"].get(topology_key)
+
+    def _domain_nodes(self, topology_key, domain):
+        if topology_key == NODE_TOPOLOGY_KEY:
+            return {domain} if domain in self.nodes else set()
+        return self.label_index.get(topology_key, {}).get(domain, set())
+
+    def _group_counts(self, pod_id, group, topology_key):
+        """Pods of a group per domain, leaving out the pod itself so it can be moved"""
+        counts = self.group_domain_counts.get(group, {}).get(topology_key, {})
+        counted_group, domains = self.pod_domains.get(pod_id, (None, ()))
+        own_domain = dict(domains).get(topology_key)
+        if counted_group != group or own_domain is None:
+            return counts
+        counts = dict(counts)
+        counts[own_domain] -= 1
+        if not counts[own_domain]:
+            del counts[own_domain]
+        return counts
+
+    def _topology_filter(self, pod_id):
+        """Turn a pod's constraints into the node set it is limited to and the domains it must avoid
+
+        Returns (allowed, rejected, required_keys) where allowed is a set of node_ids
+        or None for no restriction, rejected is {topology_key: set of domains} and
+        required_keys are topology keys the node must have a label for. Only the
+        label index and the group's per-domain counts are consulted, so the cost
+        depends on the number of domains rather than on the number of nodes or pods.
+        Returns None if the pod has no constraints.
+        """
+        constraints = self.pod_constraints.get(pod_id)
+        if constraints is None:
+            return None
+
+        allowed = None
+        rejected = {}
+        required_keys = set()
+
+        # Intersect the label index sets, smallest first
+        for key, value in sorted(constraints["node_selector"].items(),
+                                 key=lambda item: len(self._domain_nodes(*item))):
+            domain_nodes = self._domain_nodes(key, value)
+            allowed = set(domain_nodes) if allowed is None else allowed & domain_nodes
+
+        group = constraints["group"]
+        topology_key = constraints["affinity"]
+        if topology_key:
+            counts = self._group_counts(pod_id, group, topology_key)
+            # The first pod of a group may go anywhere
+            if counts:
+                affine = set()
+                for domain in counts:
+                    affine |= self._domain_nodes(topology_key, domain)
+                allowed = affine if allowed is None else allowed & affine
+
+        topology_key = constraints["anti_affinity"]
+        if topology_key:
+            rejected.setdefault(topology_key, set()).update(self._group_counts(pod_id, group, topology_key))
+            required_keys.add(topology_key)
+
+        spread = constraints["spread"]
+        if spread:
+            topology_key = spread["topology_key"]
+            counts = self._group_counts(pod_id, group, topology_key)
+            if topology_key == NODE_TOPOLOGY_KEY:
+                domain_count = len(self.nodes)
+            else:
+                domain_count = len(self.label_index.get(topology_key, {}))
+            # Domains without pods of the group are not in counts, so the minimum is usually zero
+            least = min(counts.values()) if counts and len(counts) >= domain_count else 0
+            rejected.setdefault(topology_key, set()).update(
+                domain for domain, count in counts.items() if count + 1 - least > spread["max_skew"]
+            )
+            required_keys.add(topology_key)
+
+        return allowed, rejected, required_keys
+
+    def _node_permitted(self, node_id, topology):
+        """Check one node against the output of _topology_filter"""
+        if topology is None:
+            return True
+        allowed, rejected, required_keys = topology
+        if allowed is not None and node_id not in allowed:
+            return False
+        for topology_key in required_keys:
+            domain = self._domain_of(node_id, topology_key)
+            if domain is None or domain in rejected.get(topology_key, ()):
+                return False
+        return True
         
     def print_pod_list(self):
         """Print the list of pods for each node"""
         for node_id, node_info in self.nodes.items():
             print(f"Node {node_id} has pods: {node_info['pods']}")
 
-    def schedule_pod(self, pod_id, cpu_request):
-        """Schedule a pod on a node with available resources"""
+    @synchronized
+    def schedule_pod(self, pod_id, cpu_request, priority_class=None, allow_preemption=True, constraints=None):
+        """Schedule a pod on a node with available resources
+
+        If no node has enough free CPU and preemption is allowed, lower-priority
+        pods are evicted from the node needing the fewest victims. Evicted pods
+        are placed back in the pending queue. Topology constraints (see
+        validate_constraints) limit which nodes are considered, including for
+        preemption.
+        """
         if pod_id in self.pod_assignments:
             print(f"Pod {pod_id} already scheduled on node {self.pod_assignments[pod_id]}")
             return self.pod_assignments[pod_id]
+
+        # Keep the priority a pod was first submitted with (e.g. when rescheduling)
+        if priority_class is not None or pod_id not in self.pod_priorities:
+            self.pod_priorities[pod_id] = self.resolve_priority(priority_class)
+        priority = self.pod_priorities[pod_id]
+        # Constraints are also kept across rescheduling
+        if constraints is not None:
+            normalised = self.validate_constraints(constraints)
+            if normalised is None:
+                self.pod_constraints.pop(pod_id, None)
+            else:
+                self.pod_constraints[pod_id] = normalised
+        topology = self._topology_filter(pod_id)
             
         # Find node with sufficient CPU
-        best_fit_node = None
-        min_cpu_remaining = float('inf')
-        
-        for node_id, node_info in self.nodes.items():
-            if node_info["cpu_available"] >= cpu_request:
-                # Use best-fit algorithm: choose node that will have minimal remaining CPU after scheduling
-                cpu_after_allocation = node_info["cpu_available"] - cpu_request
-                if cpu_after_allocation < min_cpu_remaining:
-                    min_cpu_remaining = cpu_after_allocation
-                    best_fit_node = node_id
+        best_fit_node = self._find_best_fit_node(cpu_request, topology)
+
+        if not best_fit_node and allow_preemption:
+            best_fit_node = self._preempt_for(pod_id, cpu_request, priority, topology)
         
         if best_fit_node:
             # Assign pod to node
-            self.nodes[best_fit_node]["cpu_available"] -= cpu_request
-            self.nodes[best_fit_node]["pods"].append(pod_id)
-            self.pod_assignments[pod_id] = best_fit_node
-            self.pod_requests[pod_id] = cpu_request
-            # Remove from pending pods if it was there
-            if pod_id in self.pending_pods:
-                del self.pending_pods[pod_id]
+            self._bind(pod_id, best_fit_node, cpu_request)
             print(f"Scheduled pod {pod_id} on node {best_fit_node}, remaining CPU: {self.nodes[best_fit_node]['cpu_available']}")
-            self.print_pod_list()  # Print the pod list after scheduling
+            if self.verbose:
+                self.print_pod_list()  # Print the pod list after scheduling
             return best_fit_node
         else:
             # Store in pending pods list
-            self.pending_pods[pod_id] = cpu_request
+            self._mark_pending(pod_id, cpu_request)
             print(f"Failed to schedule pod {pod_id}: No nodes with {cpu_request} CPU available. Added to pending pods queue.")
             return None
+
+    def _find_best_fit_node(self, cpu_request, topology=None):
+        """Return the node that will have minimal remaining CPU after scheduling
+
+        topology is the output of _topology_filter for constrained pods.
+        """
+        if self.placement_mode == "usage" and self.usage_provider:
+            node_id = self._find_usage_aware_node(cpu_request, topology)
+            if node_id:
+                return node_id
+
+        # Use best-fit algorithm: the first candidate has the least CPU available that still fits
+        candidates = self._candidates_for(cpu_request)
+        if topology is None:
+            return candidates[0][1] if candidates else None
+
+        allowed = topology[0]
+        if allowed is not None and len(allowed) < len(candidates):
+            # A selective constraint: best-fit over its node set beats walking the whole list
+            fits = [
+                (self.nodes[node_id]["cpu_available"], node_id)
+                for node_id in allowed
+                if self.indexed_available.get(node_id, -1) >= cpu_request and self._node_permitted(node_id, topology)
+            ]
+            return min(fits)[1] if fits else None
+
+        # Otherwise take the tightest fit that satisfies the constraints; only rejected nodes are skipped
+        for cpu_available, node_id in candidates:
+            if self._node_permitted(node_id, topology):
+                return node_id
+        return None
+
+    def _find_usage_aware_node(self, cpu_request, topology=None):
+        """Best-fit on measured headroom among nodes whose requests also fit
+
+        A node's headroom is its capacity minus whichever is larger, the CPU
+        requested by its pods or the CPU they were measured using. Nodes that
+        run hotter than their requests are skipped if their headroom is too
+        small. Returns None if no node has enough headroom, in which case the
+        caller falls back to packing on requests alone.
+        """
+        best_fit_node = None
+        min_headroom_remaining = float('inf')
+
+        for node_id, node_info in self.nodes.items():
+            if node_info["cpu_available"] < cpu_request or node_id in self.unschedulable_nodes:
+                continue
+            if not self._node_permitted(node_id, topology):
+                continue
+            allocated = node_info["cpu_capacity"] - node_info["cpu_available"]
+            measured = self.usage_provider(node_id)
+            headroom = node_info["cpu_capacity"] - max(allocated, measured or 0)
+            if headroom >= cpu_request and headroom - cpu_request < min_headroom_remaining:
+                min_headroom_remaining = headroom - cpu_request
+                best_fit_node = node_id
+
+        return best_fit_node
+
+    def _bind(self, pod_id, node_id, cpu_request):
+        """Record a pod as running on a node and update the indexes"""
+        self.nodes[node_id]["cpu_available"] -= cpu_request
+        self.nodes[node_id]["pods"].append(pod_id)
+        self.pod_assignments[pod_id] = node_id
+        self.pod_requests[pod_id] = cpu_request
+        bisect.insort(self.preemption_index[node_id], (self.get_pod_priority(pod_id), pod_id))
+        self._count_priority(node_id, self.get_pod_priority(pod_id), 1)
+        self._reindex_node(node_id)
+        group = self.pod_constraints.get(pod_id, {}).get("group")
+        if group:
+            # Count the pod in its node and in every labelled domain the node belongs to
+            domains = [(NODE_TOPOLOGY_KEY, node_id)] + list(self.nodes[node_id]["labels"].items())
+            group_counts = self.group_domain_counts.setdefault(group, {})
+            for topology_key, domain in domains:
+                counts = group_counts.setdefault(topology_key, {})
+                counts[domain] = counts.get(domain, 0) + 1
+            self.pod_domains[pod_id] = (group, domains)
+        # Remove from pending pods if it was there
+        if pod_id in self.pending_pods:
+            del self.pending_pods[pod_id]
+        if pod_id in self.pending_since:
+            self.pending_wait_times.append(time.time() - self.pending_since.pop(pod_id))
+        self._notify("bound", pod_id, node_id)
+
+    def _mark_pending(self, pod_id, cpu_request):
+        """Put a pod in the pending queue, keeping its original queueing time"""
+        self.pending_pods[pod_id] = cpu_request
+        self.pending_since.setdefault(pod_id, time.time())
+
+    @synchronized
+    def assign_pod_to_node(self, pod_id, node_id):
+        """Place a pending or running pod on a specific node
+
+        A running pod is migrated off its current node. Returns False if the
+        node is unknown or does not have room for the pod.
+        """
+        if node_id not in self.nodes or node_id in self.unschedulable_nodes:
+            return False
+        if self.pod_assignments.get(pod_id) == node_id:
+            return True
+
+        if pod_id in self.pod_assignments:
+            cpu_request = self.pod_requests.get(pod_id, 10)
+        elif pod_id in self.pending_pods:
+            cpu_request = self.pending_pods[pod_id]
+        else:
+            return False
+
+        if self.nodes[node_id]["cpu_available"] < cpu_request:
+            return False
+        if not self._node_permitted(node_id, self._topology_filter(pod_id)):
+            return False
+
+        old_node = self.pod_assignments.get(pod_id)
+        self.unschedule_pod(pod_id)
+        self._bind(pod_id, node_id, cpu_request)
+        if old_node:
+            print(f"Migrated pod {pod_id} from node {old_node} to node {node_id}")
+        else:
+            print(f"Placed pending pod {pod_id} on node {node_id}")
+        return True
+
+    @synchronized
+    def get_pending_latency_stats(self):
+        """Summarise how long placed pods waited and how long current pods have been waiting"""
+        now = time.time()
+        waits = sorted(self.pending_wait_times)
+        current = [now - since for since in self.pending_since.values()]
+        return {
+            "placed_count": len(waits),
+            "placed_mean_wait": sum(waits) / len(waits) if waits else 0.0,
+            "placed_p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "pending_count": len(self.pending_pods),
+            "pending_oldest_wait": max(current) if current else 0.0
+        }
+
+    def _select_victims(self, node_id, cpu_request, priority):
+        """Return the fewest lower-priority pods on a node whose eviction frees enough CPU
+
+        Returns None if evicting every lower-priority pod would still not be enough.
+        """
+        index = self.preemption_index[node_id]
+        # The index is sorted by priority, so the eviction candidates form a prefix
+        if not index or index[0][0] >= priority:
+            return None
+        eligible = index[:bisect.bisect_left(index, (priority,))]
+
+        cpu_needed = cpu_request - self.nodes[node_id]["cpu_available"]
+        # Taking the largest pods first gives the smallest victim count; ties go to lower priority
+        eligible.sort(key=lambda entry: (-self.pod_requests.get(entry[1], 10), entry[0]))
+        victims = []
+        for victim_priority, victim_id in eligible:
+            if cpu_needed <= 0:
+                break
+            victims.append(victim_id)
+            cpu_needed -= self.pod_requests.get(victim_id, 10)
+
+        if cpu_needed > 0:
+            return None
+        return victims
+
+    def _preempt_for(self, pod_id, cpu_request, priority, topology=None):
+        """Evict the minimal set of lower-priority pods to make room for a pod
+
+        Only nodes the pod's topology constraints allow are considered.
+        Returns the node that was freed up, or None if preemption cannot help.
+        """
+        # Only nodes holding lower-priority pods can yield victims; usually there are none at all
+        eligible_nodes = set()
+        for victim_priority, holders in self.priority_nodes.items():
+            if victim_priority < priority:
+                eligible_nodes.update(holders)
+        if not eligible_nodes:
+            return None
+
+        best_node = None
+        best_victims = None
+        best_cost = None
+
+        for node_id in sorted(eligible_nodes):
+            node_info = self.nodes[node_id]
+            if node_info["cpu_capacity"] < cpu_request or node_id in self.unschedulable_nodes:
+                continue
+            if not self._node_permitted(node_id, topology):
+                continue
+            victims = self._select_victims(node_id, cpu_request, priority)
+            if victims is None:
+                continue
+            # Prefer fewer victims, then lower-priority victims
+            cost = (len(victims), sum(self.get_pod_priority(v) for v in victims))
+            if best_cost is None or cost < best_cost:
+                best_node, best_victims, best_cost = node_id, victims, cost
+                if len(victims) == 1 and self.get_pod_priority(victims[0]) == min(PRIORITY_CLASSES.values()):
+                    # Cannot do better than a single lowest-priority victim
+                    break
+
+        if best_node is None:
+            return None
+
+        for victim_id in best_victims:
+            victim_cpu = self.pod_requests.get(victim_id, 10)
+            self.unschedule_pod(victim_id)
+            self._mark_pending(victim_id, victim_cpu)
+            print(f"Preempted pod {victim_id} from node {best_node} to make room for pod {pod_id}. Added to pending pods queue.")
+
+        return best_node
             
     def get_node_for_pod(self, pod_id):
         """Return the node a pod is scheduled on"""
@@ -62,6 +575,7 @@ class PodScheduler:
         """Return the CPU request for a pod"""
         return self.pod_requests.get(pod_id, 10)  # Default to 10 if not found
         
+    @synchronized
     def unschedule_pod(self, pod_id):
         """Remove a pod from its node"""
         if pod_id not in self.pod_assignments:
@@ -78,14 +592,45 @@ class PodScheduler:
             # Remove pod from node
             if pod_id in self.nodes[node_id]["pods"]:
                 self.nodes[node_id]["pods"].remove(pod_id)
+
+            index = self.preemption_index.get(node_id, [])
+            position = bisect.bisect_left(index, (self.get_pod_priority(pod_id), pod_id))
+            if position < len(index) and index[position][1] == pod_id:
+                del index[position]
+                self._count_priority(node_id, self.get_pod_priority(pod_id), -1)
+            self._reindex_node(node_id)
         
+        # Stop counting the pod towards its group's domains
+        group, domains = self.pod_domains.pop(pod_id, (None, ()))
+        for topology_key, domain in domains:
+            counts = self.group_domain_counts[group][topology_key]
+            counts[domain] -= 1
+            if not counts[domain]:
+                del counts[domain]
+
         # Remove from tracking dictionaries
         del self.pod_assignments[pod_id]
         if pod_id in self.pod_requests:
             del self.pod_requests[pod_id]
+
+        self._notify("unbound", pod_id, node_id)
             
         return True
         
+    @synchronized
+    def delete_pod(self, pod_id):
+        """Forget a pod entirely, releasing its CPU if it was running
+
+        Returns False if the pod was neither running nor pending.
+        """
+        was_running = self.unschedule_pod(pod_id)
+        was_pending = self.pending_pods.pop(pod_id, None) is not None
+        self.pending_since.pop(pod_id, None)
+        self.pod_priorities.pop(pod_id, None)
+        self.pod_constraints.pop(pod_id, None)
+        return was_running or was_pending
+        
+    @synchronized
     def reschedule_pods(self, pods_dict):
         """Reschedule pods from failed nodes
         
@@ -146,19 +691,58 @@ class PodScheduler:
                 
         return results
         
-    def schedule_pending_pods(self):
-        """Try to schedule any pending pods"""
+    @synchronized
+    def schedule_pending_pods(self, freed_node=None, freed_group=None):
+        """Try to schedule any pending pods
+
+        If freed_node is given, the only change since the last attempt is a pod
+        of freed_group (if it had one) leaving that node. Only pods that fit the
+        node's free CPU are retried, stopping once it cannot take the smallest
+        of them, plus pending pods of the same group, whose affinity,
+        anti-affinity or spread constraints the departure may have satisfied on
+        any node. Neither uses preemption.
+        """
         if not self.pending_pods:
             return {}
+
+        group_pods = set()
+        if freed_node is not None:
+            if freed_node in self.nodes and freed_node not in self.unschedulable_nodes:
+                free = self.nodes[freed_node]["cpu_available"]
+            else:
+                free = -1
+            if freed_group:
+                group_pods = {pod_id for pod_id in self.pending_pods if self.get_pod_group(pod_id) == freed_group}
+            candidates = [
+                (pod_id, cpu) for pod_id, cpu in self.pending_pods.items() if cpu <= free or pod_id in group_pods
+            ]
+            if not candidates:
+                return {}
+            fitting = [cpu for pod_id, cpu in candidates if cpu <= free]
+            smallest_request = min(fitting) if fitting else None
+        else:
+            candidates = list(self.pending_pods.items())
             
-        print(f"Attempting to schedule {len(self.pending_pods)} pending pods")
+        print(f"Attempting to schedule {len(candidates)} pending pods")
         results = {}
         
-        # Create a copy to iterate over, as we'll be modifying the original during iteration
-        pending_pods_copy = self.pending_pods.copy()
+        # Create a copy to iterate over, as we'll be modifying the original during iteration.
+        # Higher-priority pods go first; arrival order is kept within a priority.
+        pending_pods_copy = sorted(candidates, key=lambda item: -self.get_pod_priority(item[0]))
         
-        for pod_id, cpu_request in pending_pods_copy.items():
-            assigned_node = self.schedule_pod(pod_id, cpu_request)
+        for pod_id, cpu_request in pending_pods_copy:
+            if pod_id not in self.pending_pods:
+                # Already placed while draining the queue
+                continue
+            if freed_node is not None and pod_id not in group_pods:
+                # Only pods that fit the freed node are here; stop once none of them can
+                if self.nodes[freed_node]["cpu_available"] < smallest_request:
+                    if not group_pods:
+                        break
+                    continue
+                if cpu_request > self.nodes[freed_node]["cpu_available"]:
+                    continue
+            assigned_node = self.schedule_pod(pod_id, cpu_request, allow_preemption=freed_node is None)
             
             if assigned_node:
                 print(f"Successfully scheduled pending pod {pod_id} on node {assigned_node}")
@@ -0,0 +1,219 @@
+import time
+from threading import Thread
+
+
+class Rebalancer:
+    """Periodically migrates pods to reclaim stranded capacity for pending pods
+
+    Best-fit only places a pod once, so over time the cluster ends up with many
+    nodes holding small unusable remainders while large pods wait. Each pass
+    plans the fewest pod moves that open up room for pending pods, then applies
+    the plan subject to a migration rate limit.
+    """
+
+    def __init__(self, pod_scheduler, interval=30, max_migrations_per_pass=10, max_migrations_per_minute=30):
+        self.pod_scheduler = pod_scheduler
+        self.interval = interval  # seconds between background passes
+        self.max_migrations_per_pass = max_migrations_per_pass
+        self.max_migrations_per_minute = max_migrations_per_minute
+        self.migration_times = []  # Timestamps of migrations in the last minute
+        self.last_plan = None
+        self.running = False
+        self.rebalance_thread = None
+
+    def start(self):
+        """Start the background rebalancing thread"""
+        if self.running:
+            return
+        self.running = True
+        self.rebalance_thread = Thread(target=self._rebalance_loop, daemon=True)
+        self.rebalance_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.rebalance_thread:
+            self.rebalance_thread.join(1)
+
+    def _rebalance_loop(self):
+        while self.running:
+            try:
+                if self.pod_scheduler.pending_pods:
+                    self.run_once()
+            except Exception as e:
+                print(f"Error in rebalancer: {e}")
+            time.sleep(self.interval)
+
+    def _migration_budget(self):
+        """Return how many migrations the rate limit allows right now"""
+        cutoff = time.time() - 60
+        self.migration_times = [t for t in self.migration_times if t > cutoff]
+        remaining_this_minute = self.max_migrations_per_minute - len(self.migration_times)
+        return max(0, min(self.max_migrations_per_pass, remaining_this_minute))
+
+    def plan(self, max_migrations=None):
+        """Compute a migration plan without changing the cluster
+
+        Returns a dictionary with:
+            migrations: list of {"pod_id", "from_node", "to_node", "for_pod"} moves, in order,
+                where for_pod is the pending pod the move makes room for
+            placements: list of {"pod_id", "node"} for pending pods the moves make room for
+            unresolved: pending pods that still cannot be placed
+
+        Unschedulable nodes are never targets, and every placement and move
+        respects the moved pod's topology constraints as they stand now.
+        """
+        if max_migrations is None:
+            max_migrations = self._migration_budget()
+
+        scheduler = self.pod_scheduler
+        available = {
+            node_id: info["cpu_available"] for node_id, info in scheduler.nodes.items()
+            if node_id not in scheduler.unschedulable_nodes
+        }
+        node_pods = {
+            node_id: {pod_id: scheduler.get_pod_cpu_request(pod_id) for pod_id in scheduler.nodes[node_id]["pods"]}
+            for node_id in available
+        }
+
+        migrations = []
+        placements = []
+        unresolved = []
+
+        # Most important and largest pods first, since they are the hardest to fit
+        pending = sorted(
+            scheduler.pending_pods.items(),
+            key=lambda item: (-scheduler.get_pod_priority(item[0]), -item[1])
+        )
+
+        for pod_id, cpu_request in pending:
+            target = self._best_fit(available, cpu_request, pod_id=pod_id)
+            moves = []
+            if target is None:
+                target, moves = self._plan_room(available, node_pods, pod_id, cpu_request,
+                                                max_migrations - len(migrations))
+            if target is None:
+                unresolved.append(pod_id)
+                continue
+
+            for moved_pod, from_node, to_node in moves:
+                moved_cpu = node_pods[from_node].pop(moved_pod)
+                node_pods[to_node][moved_pod] = moved_cpu
+                available[from_node] += moved_cpu
+                available[to_node] -= moved_cpu
+                migrations.append({"pod_id": moved_pod, "from_node": from_node, "to_node": to_node, "for_pod": pod_id})
+
+            available[target] -= cpu_request
+            node_pods[target][pod_id] = cpu_request
+            placements.append({"pod_id": pod_id, "node": target})
+
+        return {
+            "migrations": migrations,
+            "placements": placements,
+            "unresolved": unresolved
+        }
+
+    def _best_fit(self, available, cpu_request, exclude=None, pod_id=None):
+        """Best-fit search over a simulated view of available CPU, among nodes pod_id may use"""
+        topology = self.pod_scheduler._topology_filter(pod_id) if pod_id is not None else None
+        best_node = None
+        min_cpu_remaining = float('inf')
+        for node_id, cpu_available in available.items():
+            if node_id == exclude or cpu_available < cpu_request:
+                continue
+            if not self.pod_scheduler._node_permitted(node_id, topology):
+                continue
+            if cpu_available - cpu_request < min_cpu_remaining:
+                min_cpu_remaining = cpu_available - cpu_request
+                best_node = node_id
+        return best_node
+
+    def _plan_room(self, available, node_pods, pending_pod, cpu_request, budget):
+        """Find the node where the fewest moves free enough CPU for a pending pod
+
+        Returns (node_id, moves) where moves is a list of (pod_id, from_node, to_node),
+        or (None, []) if no node can be freed within the migration budget.
+        """
+        topology = self.pod_scheduler._topology_filter(pending_pod)
+        best_node = None
+        best_moves = None
+
+        for node_id, pods in node_pods.items():
+            capacity = self.pod_scheduler.nodes[node_id]["cpu_capacity"]
+            if capacity < cpu_request or budget <= 0:
+                continue
+            if not self.pod_scheduler._node_permitted(node_id, topology):
+                continue
+
+            cpu_needed = cpu_request - available[node_id]
+            simulated = dict(available)
+            moves = []
+            # Moving the largest pods first needs the fewest moves
+            for pod_id, pod_cpu in sorted(pods.items(), key=lambda item: -item[1]):
+                if cpu_needed <= 0 or len(moves) >= budget:
+                    break
+                if best_moves is not None and len(moves) + 1 >= len(best_moves):
+                    break
+                destination = self._best_fit(simulated, pod_cpu, exclude=node_id, pod_id=pod_id)
+                if destination is None:
+                    continue
+                simulated[destination] -= pod_cpu
+                moves.append((pod_id, node_id, destination))
+                cpu_needed -= pod_cpu
+
+            if cpu_needed <= 0 and (best_moves is None or len(moves) < len(best_moves)):
+                best_node, best_moves = node_id, moves
+                if len(moves) == 1:
+                    break
+
+        if best_node is None:
+            return None, []
+        return best_node, best_moves
+
+    def run_once(self, dry_run=False):
+        """Plan and, unless dry_run is set, apply one rebalancing pass"""
+        # Hold the scheduler lock so the plan is applied to the state it was computed from
+        with self.pod_scheduler.lock:
+            plan = self.plan()
+            self.last_plan = plan
+            if dry_run:
+                return plan
+
+            applied = []
+            placed = []
+            for placement in plan["placements"]:
+                moves = [m for m in plan["migrations"] if m["for_pod"] == placement["pod_id"]]
+                if placement["pod_id"] not in self.pod_scheduler.pending_pods:
+                    continue
+                if len(moves) > self._migration_budget():
+                    print(f"Rebalancer migration rate limit reached, deferring moves for pod {placement['pod_id']}")
+                    continue
+                done = self._apply_moves(moves)
+                if done is not None and self.pod_scheduler.assign_pod_to_node(placement["pod_id"], placement["node"]):
+                    applied.extend(done)
+                    placed.append(placement)
+                elif done:
+                    # The pod still cannot go there, so the moves would only churn the cluster
+                    self._undo_moves(done)
+
+            return {
+                "migrations": applied,
+                "placements": placed,
+                "unresolved": list(self.pod_scheduler.pending_pods)
+            }
+
+    def _apply_moves(self, moves):
+        """Apply a placement's moves; returns the applied moves, or None after undoing them on failure"""
+        done = []
+        for migration in moves:
+            if (self.pod_scheduler.get_node_for_pod(migration["pod_id"]) != migration["from_node"]
+                    or not self.pod_scheduler.assign_pod_to_node(migration["pod_id"], migration["to_node"])):
+                # Cluster changed since planning
+                self._undo_moves(done)
+                return None
+            self.migration_times.append(time.time())
+            done.append(migration)
+        return done
+
+    def _undo_moves(self, moves):
+        for migration in reversed(moves):
+            self.pod_scheduler.assign_pod_to_node(migration["pod_id"], migration["from_node"])
@@ -0,0 +1,59 @@
+from array import array
+
+
+class RingBuffer:
+    """Fixed-size window of floats with O(1) append, mean and variance
+
+    Values are stored in a flat array of doubles, so a window costs 8 bytes
+    per sample regardless of how long the node has been running.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = array('d', [0.0] * size)
+        self.index = 0  # Slot the next value is written to
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def append(self, value):
+        if self.count == self.size:
+            old = self.values[self.index]
+            self.total -= old
+            self.total_squares -= old * old
+        else:
+            self.count += 1
+
+        self.values[self.index] = value
+        self.total += value
+        self.total_squares += value * value
+        self.index = (self.index + 1) % self.size
+
+        if self.index == 0:
+            # Recompute once per wrap so floating point drift does not accumulate
+            self.total = sum(self.values)
+            self.total_squares = sum(v * v for v in self.values)
+
+    def __len__(self):
+        return self.count
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        mean = self.mean()
+        return max(0.0, self.total_squares / self.count - mean * mean)
+
+    def last(self):
+        """Return the most recently appended value"""
+        if not self.count:
+            return None
+        return self.values[self.index - 1]
+
+    def to_list(self):
+        """Return the stored values, oldest first"""
+        if self.count < self.size:
+            return list(self.values[:self.count])
+        return list(self.values[self.index:]) + list(self.values[:self.index])
@@ -1,27 +1,90 @@
-from pod_scheduler import PodScheduler
+from pod_scheduler import PodScheduler, NODE_TOPOLOGY_KEY
 from node_manager import NodeManager
 from health_manager import HealthManager
+from rebalancer import Rebalancer
+from usage_collector import UsageCollector, DockerStatsSource
+from pod_runtime import PodRuntime
+from expiry import ExpiryEngine
+from autoscaler import Autoscaler
+import time
 
 class Scheduler:
-    def __init__(self):
-        self.node_manager = NodeManager()
+    def __init__(self, heartbeat_port=None, usage_aware=False, stats_source=None, autoscale=False, autoscaler_options=None,
+                 allow_host_commands=False, detector_options=None, use_docker=True):
+        # With a heartbeat port, node containers report liveness over UDP instead of in-process calls
+        heartbeat_address = ("host.docker.internal", heartbeat_port) if heartbeat_port else None
+        # Without use_docker every node is simulated and Docker is never contacted
+        self.node_manager = NodeManager(heartbeat_address=heartbeat_address, use_docker=use_docker)
         self.pod_scheduler = PodScheduler()
-        # Initialize health_manager with only node_manager
-        self.health_manager = HealthManager(self.node_manager)
+        # Initialize health_manager with only node_manager; background threads wait for start()
+        self.health_manager = HealthManager(self.node_manager, autostart=False, detector_options=detector_options)
+        self.heartbeat_port = heartbeat_port
         # Then set the pod_scheduler reference
         self.health_manager.set_pod_scheduler(self.pod_scheduler)
         self.rescheduled_pods = {}  # Track recently rescheduled pods
+        # Seconds a health sweep is reused when scheduling, so bursts of pods do not re-check every node
+        self.health_status_max_age = 1.0
+        # Background defragmentation
+        self.rebalancer = Rebalancer(self.pod_scheduler)
+        # Measured container usage; a fake stats_source can stand in for Docker in tests
+        self.usage_collector = UsageCollector(self.node_manager, stats_source)
+        if usage_aware:
+            self.pod_scheduler.set_usage_provider(self.usage_collector.get_cpu_usage)
+        # Runs pod commands on their assigned node as placements change. Pods on simulated nodes
+        # would run on this host, which is only allowed when allow_host_commands is set.
+        self.pod_runtime = PodRuntime(self.node_manager, allow_host_commands=allow_host_commands)
+        self.pod_scheduler.add_placement_listener(self.pod_runtime.on_placement)
+        # Pods whose command exits for good release their CPU
+        self.pod_runtime.add_finish_callback(lambda pod_id, status: self.complete_pod(pod_id))
+        # Pods with a TTL are completed when it runs out, counted from when they are first placed
+        self.pod_ttls = {}  # {pod_id: seconds}
+        self.expiry_engine = ExpiryEngine(self.complete_pod)
+        self.pod_scheduler.add_placement_listener(self._start_ttl_on_bind)
+        # Adds nodes for pending pods and removes idle ones; only runs in the background if autoscale is set
+        self.autoscale = autoscale
+        self.autoscaler = Autoscaler(self, **(autoscaler_options or {}))
         
-    def add_node(self, node_id, cpu_capacity):
-        """Add a new node to the cluster"""
+    def start(self):
+        """Start the background threads: health monitoring, rebalancing, usage sampling, pods and TTLs"""
+        health_monitor = self.health_manager.get_health_monitor()
+        health_monitor.start()
+        if self.heartbeat_port:
+            health_monitor.start_listener(port=self.heartbeat_port)
+        self.rebalancer.start()
+        if self.usage_collector.stats_source is None and self.node_manager.docker_available:
+            self.usage_collector.stats_source = DockerStatsSource(self.node_manager.client)
+        self.usage_collector.start()
+        self.pod_runtime.start()
+        self.expiry_engine.start()
+        if self.autoscale:
+            self.autoscaler.start()
+
+    def stop(self):
+        """Stop all background threads started by start()"""
+        self.autoscaler.stop()
+        self.rebalancer.stop()
+        self.usage_collector.stop()
+        self.pod_runtime.stop()
+        self.expiry_engine.stop()
+        self.health_manager.get_health_monitor().stop()
+
+    def add_node(self, node_id, cpu_capacity, memory_capacity=None, labels=None):
+        """Add a new node to the cluster
+
+        labels (e.g. {"zone": "a", "rack": "a1"}) place the node in failure domains
+        that pod affinity, anti-affinity and spread constraints refer to.
+        """
+        if labels and NODE_TOPOLOGY_KEY in labels:
+            return False, f"'{NODE_TOPOLOGY_KEY}' is reserved and cannot be used as a node label"
+
         # Add node to node manager (creates Docker container)
-        success, message = self.node_manager.add_node(node_id, cpu_capacity)
+        success, message = self.node_manager.add_node(node_id, cpu_capacity, memory_capacity, labels)
         
         if not success:
             return False, message
         
         # Register node with pod scheduler
-        self.pod_scheduler.register_node(node_id, cpu_capacity)
+        self.pod_scheduler.register_node(node_id, cpu_capacity, labels)
         
         # Try to schedule any pending pods
         scheduled_pending = self.pod_scheduler.schedule_pending_pods()
@@ -30,15 +93,40 @@ class Scheduler:
         self.health_manager.register_node_with_health_monitor(node_id)
         
         return True, f"Node {node_id} added successfully"
+
+    def add_nodes(self, node_specs):
+        """Add several nodes, starting their containers in parallel
+
+        node_specs is a list of {"node_id", "cpu_capacity", "memory_capacity", "labels"}
+        dictionaries. Pending pods are scheduled once all nodes are registered.
+        Returns {node_id: (success, message)}.
+        """
+        results = {}
+        specs = []
+        for spec in node_specs:
+            if NODE_TOPOLOGY_KEY in (spec.get("labels") or {}):
+                results[spec["node_id"]] = (False, f"'{NODE_TOPOLOGY_KEY}' is reserved and cannot be used as a node label")
+            else:
+                specs.append(spec)
+
+        specs_by_id = {spec["node_id"]: spec for spec in specs}
+        for node_id, (success, message) in self.node_manager.add_nodes(specs).items():
+            results[node_id] = (success, message)
+            if not success:
+                continue
+            spec = specs_by_id[node_id]
+            self.pod_scheduler.register_node(node_id, spec["cpu_capacity"], spec.get("labels"))
+            self.health_manager.register_node_with_health_monitor(node_id)
+            results[node_id] = (True, f"Node {node_id} added successfully")
+
+        self.pod_scheduler.schedule_pending_pods()
+        return results
     
     def remove_node(self, node_id):
         """Remove a node from the cluster"""
         # First, get the pods that were on this node for proper rescheduling
-        node_pods = []
-        if node_id in self.pod_scheduler.nodes:
-            node_pods = self.pod_scheduler.nodes[node_id].get("pods", []).copy()
-            # Remove the node from pod_scheduler BEFORE rescheduling
-            del self.pod_scheduler.nodes[node_id]
+        # Remove the node from pod_scheduler BEFORE rescheduling
+        node_pods = self.pod_scheduler.deregister_node(node_id)
 
         # Add these pods to the rescheduling list
         if node_pods:
@@ -68,10 +156,20 @@ class Scheduler:
 
         return success, message
         
-    def schedule_pod(self, pod_id, cpu_request):
-        """Schedule a pod on an available node"""
+    def schedule_pod(self, pod_id, cpu_request, priority_class=None, command=None, ttl=None, constraints=None):
+        """Schedule a pod on an available node, preempting lower-priority pods if needed
+
+        If a command is given, it is run on the assigned node once the pod is placed.
+        If a ttl (seconds) is given, the pod is completed that long after it is first placed.
+        constraints are topology constraints, see PodScheduler.validate_constraints.
+        """
+        if command and pod_id not in self.pod_scheduler.pod_assignments:
+            self.pod_runtime.submit(pod_id, command)
+        if ttl:
+            self.pod_ttls[pod_id] = ttl
+
         # Get node health status
-        health_status = self.health_manager.get_node_health_status()
+        health_status = self._refresh_node_health(self.health_status_max_age)
         
         # First check if pod is already assigned to a node that no longer exists
         if pod_id in self.pod_scheduler.pod_assignments:
@@ -82,7 +180,7 @@ class Scheduler:
                 self.pod_scheduler.unschedule_pod(pod_id)
         
         # Schedule pod
-        assigned_node = self.pod_scheduler.schedule_pod(pod_id, cpu_request)
+        assigned_node = self.pod_scheduler.schedule_pod(pod_id, cpu_request, priority_class, constraints=constraints)
         
         # If assigned node is not healthy, return None
         if assigned_node and assigned_node in health_status and health_status[assigned_node] != "Healthy":
@@ -90,6 +188,15 @@ class Scheduler:
             
         return assigned_node
     
+    def _refresh_node_health(self, max_age=None):
+        """Get node health and keep unhealthy nodes out of pod placement"""
+        health_status = self.health_manager.get_node_health_status(max_age)
+        # Only nodes whose health flipped in some sweep are touched, so reusing a cached sweep costs nothing
+        for node_id, status in self.health_manager.pop_health_changes().items():
+            if node_id in self.pod_scheduler.nodes:
+                self.pod_scheduler.set_node_schedulable(node_id, status == "Healthy")
+        return health_status
+
     def process_pod_rescheduling(self):
         """Check for and reschedule pods from failed nodes"""
         # Get pods that need rescheduling from the health manager
@@ -109,7 +216,7 @@ class Scheduler:
     def check_and_repair_cluster(self):
         """Check cluster health and reschedule pods if needed"""
         # Update node health status (this will detect newly failed nodes)
-        health_status = self.health_manager.get_node_health_status()
+        health_status = self._refresh_node_health()
         
         # Find any nodes that are unhealthy and force rescheduling of their pods
         for node_id, status in health_status.items():
@@ -138,10 +245,55 @@ class Scheduler:
         self.rescheduled_pods = {}
         return rescheduled
         
+    def _start_ttl_on_bind(self, event, pod_id, node_id):
+        """Placement listener that starts a pod's TTL the first time it is bound"""
+        if event == "bound" and pod_id in self.pod_ttls:
+            self.expiry_engine.schedule(pod_id, time.time() + self.pod_ttls.pop(pod_id))
+
+    def delete_pod(self, pod_id):
+        """Remove a pod from the cluster and hand its CPU to pending pods"""
+        return self._finish_pod(pod_id, "deleted")
+
+    def complete_pod(self, pod_id):
+        """Mark a pod as finished, releasing its CPU to pending pods"""
+        return self._finish_pod(pod_id, "completed")
+
+    def _finish_pod(self, pod_id, reason):
+        self.expiry_engine.cancel(pod_id)
+        self.pod_ttls.pop(pod_id, None)
+        self.pod_runtime.terminate(pod_id)
+
+        node_id = self.pod_scheduler.get_node_for_pod(pod_id)
+        group = self.pod_scheduler.get_pod_group(pod_id)
+        if not self.pod_scheduler.delete_pod(pod_id):
+            return False, f"Pod {pod_id} not found"
+
+        print(f"Pod {pod_id} {reason}")
+        # Freed capacity goes straight to pods waiting for it: those that fit it, and those of the
+        # pod's group whose topology constraints it may have been blocking
+        if node_id is not None:
+            self.pod_scheduler.schedule_pending_pods(freed_node=node_id, freed_group=group)
+        return True, f"Pod {pod_id} {reason}"
+
+    def get_pod_status(self, pod_id=None):
+        """Get runtime status and time-to-running for pods with commands"""
+        return self.pod_runtime.get_pod_status(pod_id)
+
+    def rebalance(self, dry_run=False):
+        """Run one rebalancing pass to make room for pending pods"""
+        return self.rebalancer.run_once(dry_run=dry_run)
+
+    def autoscale_once(self, dry_run=False):
+        """Run one autoscaling pass, adding nodes for pending pods or removing idle ones"""
+        return self.autoscaler.run_once(dry_run=dry_run)
+
     def get_cluster_status(self):
         """Get comprehensive cluster status"""
         nodes = self.node_manager.list_nodes()
         health_status = self.health_manager.get_node_health_status()
+        suspicion_levels = self.health_manager.get_suspicion_levels()
+        node_usage = self.health_manager.get_node_usage()
+        measured_usage = self.usage_collector.get_usage_summary()
         scheduler_nodes = self.pod_scheduler.nodes
         
         cluster_status = {}
@@ -150,7 +302,11 @@ class Scheduler:
             cluster_status[node_id] = {
                 "container_id": node_info["container_id"],
                 "cpu_capacity": node_info["cpu_capacity"],
+                "labels": node_info.get("labels", {}),
                 "health": health_status.get(node_id, "Unknown"),
+                "suspicion": round(suspicion_levels.get(node_id, 0.0), 2),
+                "usage": node_usage.get(node_id, {}),
+                "measured_usage": measured_usage.get(node_id, {}),
                 "cpu_available": scheduler_nodes.get(node_id, {}).get("cpu_available", 0),
                 "pods": scheduler_nodes.get(node_id, {}).get("pods", [])
             }
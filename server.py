@@ -1,91 +1,195 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Blueprint, current_app, request, jsonify, render_template
 from scheduler import Scheduler
+from pod_scheduler import PRIORITY_CLASSES
 from node import Node
 import os
 import threading
 import time
 
-app = Flask(__name__, template_folder=os.path.abspath('templates'))
-scheduler = Scheduler()
+routes = Blueprint('cluster', __name__)
 
-# Store Node objects that send heartbeats
-node_objects = {}
+class ClusterState:
+    """Scheduler plus the server-side objects and threads that go with it"""
 
-# Global flag for repair thread
-repair_thread_running = True
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        # Store Node objects that send heartbeats
+        self.node_objects = {}
+        # Flag for repair thread
+        self.repair_thread_running = False
+        self.repair_thread = None
+        # Nodes added or removed by the autoscaler get the same treatment as ones added through the API
+        self.scheduler.autoscaler.add_listener(self.on_autoscale)
 
-def update_node_objects_with_pod(pod_id, node_id):
-    """Update Node objects to reflect pod assignment"""
-    # Remove pod from all nodes first
-    for node in node_objects.values():
-        node.remove_pod(pod_id)
-    
-    # Add pod to the assigned node
-    if node_id and node_id in node_objects:
-        node_objects[node_id].add_pod(pod_id)
-        print(f"Updated Node object: Pod {pod_id} added to node {node_id}")
+    def add_node_object(self, node_id, cpu_capacity):
+        """Nodes without a heartbeat agent in their container get an in-process Node that sends heartbeats"""
+        if not self.scheduler.node_manager.nodes[node_id].get("heartbeat_agent"):
+            health_monitor = self.scheduler.health_manager.get_health_monitor()
+            self.node_objects[node_id] = Node(node_id, cpu_capacity=cpu_capacity, health_monitor=health_monitor)
 
-def cluster_repair_thread():
-    """Background thread to check cluster health and reschedule pods"""
-    global repair_thread_running
-    
-    while repair_thread_running:
-        try:
-            # Check health and reschedule pods if needed
-            rescheduled_pods = scheduler.check_and_repair_cluster()
+    def remove_node_object(self, node_id):
+        """Stop node heartbeat threads if node exists in object list"""
+        if node_id in self.node_objects:
+            self.node_objects[node_id].stop()
+            del self.node_objects[node_id]
+
+    def on_autoscale(self, event, node_ids):
+        """Autoscaler listener"""
+        for node_id in node_ids:
+            if event == "added":
+                self.add_node_object(node_id, self.scheduler.pod_scheduler.nodes[node_id]["cpu_capacity"])
+            else:
+                self.remove_node_object(node_id)
+
+    def update_node_objects_with_pod(self, pod_id, node_id):
+        """Update Node objects to reflect pod assignment"""
+        # Remove pod from all nodes first
+        for node in self.node_objects.values():
+            node.remove_pod(pod_id)
+        
+        # Add pod to the assigned node
+        if node_id and node_id in self.node_objects:
+            self.node_objects[node_id].add_pod(pod_id)
+            print(f"Updated Node object: Pod {pod_id} added to node {node_id}")
+
+    def cluster_repair_thread(self):
+        """Background thread to check cluster health and reschedule pods"""
+        while self.repair_thread_running:
+            try:
+                # Check health and reschedule pods if needed
+                rescheduled_pods = self.scheduler.check_and_repair_cluster()
+                
+                # Update node objects with rescheduled pods
+                for pod_id, pod_info in rescheduled_pods.items():
+                    new_node = pod_info.get('new_node')
+                    if new_node:
+                        self.update_node_objects_with_pod(pod_id, new_node)
+                        print(f"Repair thread: Pod {pod_id} rescheduled to node {new_node}")
+            except Exception as e:
+                print(f"Error in repair thread: {e}")
             
-            # Update node objects with rescheduled pods
-            for pod_id, pod_info in rescheduled_pods.items():
-                new_node = pod_info.get('new_node')
-                if new_node:
-                    update_node_objects_with_pod(pod_id, new_node)
-                    print(f"Repair thread: Pod {pod_id} rescheduled to node {new_node}")
-        except Exception as e:
-            print(f"Error in repair thread: {e}")
+            # Sleep for a while
+            time.sleep(5)  # Check every 5 seconds
+
+    def start(self):
+        """Start the repair thread and the scheduler's background threads"""
+        self.repair_thread_running = True
+        self.repair_thread = threading.Thread(target=self.cluster_repair_thread, daemon=True)
+        self.repair_thread.start()
+        self.scheduler.start()
+
+    def shutdown(self):
+        """Stop all node threads, the repair thread and the scheduler's background threads"""
+        # Stop repair thread
+        self.repair_thread_running = False
+        if self.repair_thread and self.repair_thread.is_alive():
+            self.repair_thread.join(1)  # Wait up to 1 second
+        
+        self.scheduler.stop()
         
-        # Sleep for a while
-        time.sleep(5)  # Check every 5 seconds
+        # Stop all node threads
+        for node in self.node_objects.values():
+            node.stop()
+
+def create_app(scheduler=None, start_background=True):
+    """Build the Flask app
+
+    Nothing is created at import time: the Scheduler (and with it the Docker
+    connection) is built here unless one is passed in, and background threads
+    only start when start_background is set.
+    """
+    app = Flask(__name__, template_folder=os.path.abspath('templates'))
+    if scheduler is None:
+        # Set HEARTBEAT_PORT to have node containers send heartbeats over UDP
+        heartbeat_port = int(os.environ.get('HEARTBEAT_PORT', 0)) or None
+        # Set USAGE_AWARE_PLACEMENT=1 to place pods using measured container CPU usage as well as requests
+        usage_aware = os.environ.get('USAGE_AWARE_PLACEMENT', '0') == '1'
+        # Set AUTOSCALE=1 to add nodes for pending pods and remove idle ones, up to AUTOSCALE_MAX_NODES
+        autoscale = os.environ.get('AUTOSCALE', '0') == '1'
+        autoscaler_options = {
+            "max_nodes": int(os.environ.get('AUTOSCALE_MAX_NODES', 50)),
+            "node_cpu_capacity": int(os.environ.get('AUTOSCALE_NODE_CPU', 100))
+        }
+        # Set ALLOW_HOST_COMMANDS=1 to let pods on simulated nodes run their command on this host.
+        # Anyone who can reach the API can then run commands here, so only do this on a trusted network.
+        allow_host_commands = os.environ.get('ALLOW_HOST_COMMANDS', '0') == '1'
+        # Set PHI_THRESHOLD / HEARTBEAT_ACCEPTABLE_PAUSE (seconds) to make failure detection more or less eager
+        detector_options = {}
+        if 'PHI_THRESHOLD' in os.environ:
+            detector_options["phi_threshold"] = float(os.environ['PHI_THRESHOLD'])
+        if 'HEARTBEAT_ACCEPTABLE_PAUSE' in os.environ:
+            detector_options["acceptable_pause"] = float(os.environ['HEARTBEAT_ACCEPTABLE_PAUSE'])
+        scheduler = Scheduler(heartbeat_port=heartbeat_port, usage_aware=usage_aware,
+                              autoscale=autoscale, autoscaler_options=autoscaler_options,
+                              allow_host_commands=allow_host_commands, detector_options=detector_options)
+    
+    cluster = ClusterState(scheduler)
+    app.extensions['cluster'] = cluster
+    app.register_blueprint(routes)
+    
+    if start_background:
+        cluster.start()
+    return app
 
-# Start the repair thread
-repair_thread = threading.Thread(target=cluster_repair_thread, daemon=True)
-repair_thread.start()
+def get_cluster():
+    return current_app.extensions['cluster']
 
-@app.route('/add_node', methods=['POST'])
+@routes.route('/add_node', methods=['POST'])
 def add_node():
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
     data = request.json
     node_id = data.get('node_id')
     cpu_capacity = data.get('cpu_capacity', 100)  # Default 100 CPU
+    memory_capacity = data.get('memory_capacity')  # MB, unlimited if not given
+    labels = data.get('labels') or {}  # Topology labels, e.g. {"zone": "a", "rack": "a1"}
     if not node_id:
         return jsonify({"error": "node_id is required"}), 400
+    if not isinstance(labels, dict):
+        return jsonify({"error": "labels must be an object"}), 400
 
-    success, message = scheduler.add_node(node_id, cpu_capacity)
+    success, message = scheduler.add_node(node_id, cpu_capacity, memory_capacity, labels)
     if success:
-        # Create a Node object that will send heartbeats to the health monitor
-        health_monitor = scheduler.health_manager.get_health_monitor()
-        node_objects[node_id] = Node(node_id, cpu_capacity=cpu_capacity, health_monitor=health_monitor)
+        cluster.add_node_object(node_id, cpu_capacity)
         return jsonify({"message": f"Node {node_id} added with {cpu_capacity} CPU"}), 201
     else:
         return jsonify({"error": message}), 400
 
-@app.route('/list_nodes', methods=['GET'])
+@routes.route('/list_nodes', methods=['GET'])
 def list_nodes():
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
     cluster_status = scheduler.get_cluster_status()
     return jsonify(cluster_status)
 
-@app.route('/schedule_pod', methods=['POST'])
+@routes.route('/schedule_pod', methods=['POST'])
 def schedule_pod():
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
     data = request.json
     pod_id = data.get('pod_id')
     cpu_request = data.get('cpu_request', 10)  # Default 10 CPU
+    priority_class = data.get('priority_class')
+    command = data.get('command')  # Optional shell command the pod runs on its node
+    ttl = data.get('ttl')  # Optional lifetime in seconds, counted from placement
+    constraints = data.get('constraints')  # Optional group, node_selector, affinity, anti_affinity, spread
     
     if not pod_id:
         return jsonify({"error": "pod_id is required"}), 400
+    if priority_class is not None and priority_class not in PRIORITY_CLASSES:
+        return jsonify({"error": f"Unknown priority_class {priority_class}. Expected one of: {', '.join(PRIORITY_CLASSES)}"}), 400
+    if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0):
+        return jsonify({"error": "ttl must be a positive number of seconds"}), 400
+    try:
+        scheduler.pod_scheduler.validate_constraints(constraints)
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"error": f"Invalid constraints: {e}"}), 400
         
-    assigned_node = scheduler.schedule_pod(pod_id, cpu_request)
+    assigned_node = scheduler.schedule_pod(pod_id, cpu_request, priority_class, command, ttl, constraints)
     
     if assigned_node:
         # Update node objects with this pod assignment
-        update_node_objects_with_pod(pod_id, assigned_node)
+        cluster.update_node_objects_with_pod(pod_id, assigned_node)
             
         return jsonify({
             "message": f"Pod {pod_id} scheduled on node {assigned_node}",
@@ -94,18 +198,53 @@ def schedule_pod():
     else:
         return jsonify({"error": "Could not schedule pod - insufficient resources or unhealthy nodes"}), 400
 
-@app.route('/remove_node', methods=['POST'])
+@routes.route('/delete_pod', methods=['POST'])
+def delete_pod():
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
+    data = request.json
+    pod_id = data.get('pod_id')
+    
+    if not pod_id:
+        return jsonify({"error": "pod_id is required"}), 400
+    
+    success, message = scheduler.delete_pod(pod_id)
+    
+    if success:
+        cluster.update_node_objects_with_pod(pod_id, None)
+        return jsonify({"message": message}), 200
+    else:
+        return jsonify({"error": message}), 404
+
+@routes.route('/complete_pod', methods=['POST'])
+def complete_pod():
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
+    data = request.json
+    pod_id = data.get('pod_id')
+    
+    if not pod_id:
+        return jsonify({"error": "pod_id is required"}), 400
+    
+    success, message = scheduler.complete_pod(pod_id)
+    
+    if success:
+        cluster.update_node_objects_with_pod(pod_id, None)
+        return jsonify({"message": message}), 200
+    else:
+        return jsonify({"error": message}), 404
+
+@routes.route('/remove_node', methods=['POST'])
 def remove_node():
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
     data = request.json
     node_id = data.get('node_id')
     
     if not node_id:
         return jsonify({"error": "node_id is required"}), 400
         
-    # Stop node heartbeat threads if node exists in object list
-    if node_id in node_objects:
-        node_objects[node_id].stop()
-        del node_objects[node_id]
+    cluster.remove_node_object(node_id)
     
     # Remove node from scheduler components (this triggers pod rescheduling)
     success, message = scheduler.remove_node(node_id)
@@ -115,50 +254,99 @@ def remove_node():
     else:
         return jsonify({"error": message}), 400
 
-@app.route('/get_rescheduled_pods', methods=['GET'])
+@routes.route('/get_rescheduled_pods', methods=['GET'])
 def get_rescheduled_pods():
     """Get information about recently rescheduled pods"""
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
     rescheduled_pods = scheduler.get_rescheduled_pods()
     
     # Update node objects with rescheduled pods
     for pod_id, pod_info in rescheduled_pods.items():
         new_node = pod_info.get('new_node')
         if new_node:
-            update_node_objects_with_pod(pod_id, new_node)
+            cluster.update_node_objects_with_pod(pod_id, new_node)
     
     return jsonify({
         "rescheduled_pods": rescheduled_pods
     })
 
-@app.route('/get_pending_pods', methods=['GET'])
+@routes.route('/get_pending_pods', methods=['GET'])
 def get_pending_pods():
     """Get information about pods waiting for node resources"""
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
     pending_pods = scheduler.pod_scheduler.pending_pods
     
     return jsonify({
         "pending_pods": {
             pod_id: {
-                "cpu_request": cpu_request
+                "cpu_request": cpu_request,
+                "priority": scheduler.pod_scheduler.get_pod_priority(pod_id)
             } for pod_id, cpu_request in pending_pods.items()
-        }
+        },
+        "latency": scheduler.pod_scheduler.get_pending_latency_stats()
     })
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+@routes.route('/get_pod_status', methods=['GET'])
+def get_pod_status():
+    """Get runtime status of pods that run a command, including time-to-running"""
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
+    pod_id = request.args.get('pod_id')
+    
+    return jsonify({
+        "pods": scheduler.get_pod_status(pod_id),
+        "time_to_running": scheduler.pod_runtime.get_time_to_running_stats()
+    })
+
+@routes.route('/rebalance', methods=['POST'])
+def rebalance():
+    """Migrate pods to make room for pending pods (or just show the plan with dry_run)"""
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
+    data = request.json or {}
+    dry_run = bool(data.get('dry_run', False))
+    
+    result = scheduler.rebalance(dry_run=dry_run)
+    
+    if not dry_run:
+        # Update node objects with migrated and newly placed pods
+        for migration in result["migrations"]:
+            cluster.update_node_objects_with_pod(migration["pod_id"], migration["to_node"])
+        for placement in result["placements"]:
+            cluster.update_node_objects_with_pod(placement["pod_id"], placement["node"])
+    
+    return jsonify({
+        "dry_run": dry_run,
+        **result
+    })
 
-# Graceful shutdown handler to stop all node threads and repair thread
-def shutdown_nodes():
-    global repair_thread_running
+@routes.route('/autoscale', methods=['POST'])
+def autoscale():
+    """Run one autoscaling pass (or just show what it would do with dry_run)"""
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
+    data = request.json or {}
+    dry_run = bool(data.get('dry_run', False))
     
-    # Stop repair thread
-    repair_thread_running = False
-    if repair_thread.is_alive():
-        repair_thread.join(1)  # Wait up to 1 second
+    result = scheduler.autoscale_once(dry_run=dry_run)
     
-    # Stop all node threads
-    for node in node_objects.values():
-        node.stop()
+    return jsonify({
+        "dry_run": dry_run,
+        **result
+    })
+
+@routes.route('/autoscaler_status', methods=['GET'])
+def autoscaler_status():
+    """Get autoscaler state, recent scaling events and pod time-to-schedule"""
+    cluster = get_cluster()
+    scheduler = cluster.scheduler
+    return jsonify(scheduler.autoscaler.get_status())
+
+@routes.route('/')
+def index():
+    return render_template('index.html')
 
 if __name__ == '__main__':
     # Make sure templates directory exists
@@ -170,8 +358,10 @@ if __name__ == '__main__':
         with open('index.html', 'r') as source:
             f.write(source.read())
     
+    app = create_app()
     try:
-        app.run(debug=True, host='0.0.0.0', port=8000)
+        # The reloader would build a second cluster in a child process
+        app.run(debug=True, host='0.0.0.0', port=8000, use_reloader=False)
     finally:
         # Ensure all node threads are stopped when the server shuts down
-        shutdown_nodes()
\ No newline at end of file
+        app.extensions['cluster'].shutdown()
@@ -0,0 +1,368 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from pod_scheduler import PodScheduler, PRIORITY_CLASSES, DEFAULT_PRIORITY_CLASS
+
+
+def _shard_summary(pod_scheduler):
+    """Capacity summary the front-end uses to route pods without asking the shard"""
+    available = [node_info["cpu_available"] for node_info in pod_scheduler.nodes.values()]
+    return {
+        "node_count": len(available),
+        "max_available": max(available) if available else 0,
+        "total_available": sum(available)
+    }
+
+
+def _shard_worker(conn, quiet):
+    """Run a PodScheduler for one node partition, serving requests over a pipe"""
+    if quiet:
+        # PodScheduler logs a line per placement; nobody reads a shard's stdout
+        sys.stdout = open(os.devnull, "w")
+
+    pod_scheduler = PodScheduler()
+
+    while True:
+        command, payload = conn.recv()
+
+        if command == "stop":
+            conn.send(("ok", (None, _shard_summary(pod_scheduler))))
+            break
+
+        try:
+            result = _handle_command(pod_scheduler, command, payload)
+        except Exception as e:
+            # Report the failure instead of dying, which would break the pipe for every later call
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            continue
+
+        conn.send(("ok", (result, _shard_summary(pod_scheduler))))
+
+
+def _drain_pending(pod_scheduler):
+    """Empty a shard's pending queue; queued pods belong to the front-end"""
+    drained = dict(pod_scheduler.pending_pods)
+    pod_scheduler.pending_pods.clear()
+    pod_scheduler.pending_since.clear()
+    return drained
+
+
+def _handle_command(pod_scheduler, command, payload):
+    if command == "register_node":
+        node_id, cpu_capacity = payload
+        pod_scheduler.register_node(node_id, cpu_capacity)
+        return None
+    elif command == "deregister_node":
+        displaced = pod_scheduler.deregister_node(payload)
+        for pod_id in displaced:
+            pod_scheduler.unschedule_pod(pod_id)
+        return displaced
+    elif command == "schedule_pods":
+        result = {}
+        for pod_id, cpu_request, priority_class in payload:
+            # Preemption is only attempted once the front-end finds no shard with room (see "preempt")
+            result[pod_id] = pod_scheduler.schedule_pod(pod_id, cpu_request, priority_class, allow_preemption=False)
+        _drain_pending(pod_scheduler)
+        return result
+    elif command == "preempt":
+        pod_id, cpu_request, priority_class = payload
+        node_id = pod_scheduler.schedule_pod(pod_id, cpu_request, priority_class)
+        # Evicted pods (and the pod itself if preemption failed) go back to the front-end queue
+        victims = _drain_pending(pod_scheduler)
+        victims.pop(pod_id, None)
+        return node_id, victims
+    elif command == "unschedule_pod":
+        return pod_scheduler.unschedule_pod(payload)
+    elif command == "nodes":
+        return pod_scheduler.nodes
+    raise ValueError(f"Unknown command {command}")
+
+
+class ShardedScheduler:
+    """Pod scheduler whose nodes are partitioned across worker processes
+
+    Each shard runs its own PodScheduler in a separate process, so scheduling
+    is not limited by a single interpreter. The front-end keeps a cached
+    capacity summary per shard (refreshed from every reply) and routes each pod
+    by sampling a few shards and picking the one with the most free CPU that
+    fits, retrying the rest only when the sampled shards are full. Requests
+    routed earlier in a round are subtracted from a shard's estimate, so a
+    batch spreads across shards instead of piling onto one. A pod that fits
+    nowhere may preempt lower-priority pods in one shard; otherwise it waits in
+    the front-end pending queue, as do preempted pods. When a node is removed,
+    its pods are rescheduled across all shards.
+    """
+
+    def __init__(self, num_shards=None, sample_size=2, quiet=True):
+        self.num_shards = num_shards or os.cpu_count() or 1
+        self.sample_size = min(sample_size, self.num_shards)
+        self.node_shards = {}  # {node_id: shard index}
+        self.pod_shards = {}  # {pod_id: shard index}
+        self.pod_assignments = {}  # {pod_id: node_id}
+        self.pod_requests = {}  # {pod_id: cpu_request}
+        self.pod_priority_classes = {}  # {pod_id: priority class name}
+        self.pending_pods = {}  # {pod_id: cpu_request}
+        self.shard_summaries = []
+        self.connections = []
+        self.processes = []
+
+        for shard in range(self.num_shards):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_shard_worker, args=(child_conn, quiet), daemon=True)
+            process.start()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+            self.shard_summaries.append({"node_count": 0, "max_available": 0, "total_available": 0})
+
+    def _send(self, shard, command, payload=None):
+        self.connections[shard].send((command, payload))
+
+    def _receive(self, shard):
+        status, reply = self.connections[shard].recv()
+        if status != "ok":
+            raise RuntimeError(f"Shard {shard} error: {reply}")
+        result, summary = reply
+        self.shard_summaries[shard] = summary
+        return result
+
+    def _call(self, shard, command, payload=None):
+        self._send(shard, command, payload)
+        return self._receive(shard)
+
+    def add_node(self, node_id, cpu_capacity):
+        """Register a node on the shard with the least total free capacity"""
+        if node_id in self.node_shards:
+            return False, f"Node {node_id} already exists"
+
+        shard = min(range(self.num_shards), key=lambda s: self.shard_summaries[s]["total_available"])
+        self._call(shard, "register_node", (node_id, cpu_capacity))
+        self.node_shards[node_id] = shard
+
+        self.schedule_pending_pods()
+        return True, f"Node {node_id} added to shard {shard}"
+
+    def _route(self, cpu_request, headroom, excluded):
+        """Pick a shard for a pod using power-of-d-choices over the capacity estimates
+
+        headroom is each shard's free CPU less what was already routed to it this
+        round; a shard also needs a node with a large enough hole.
+        """
+        def fits(shard):
+            return (shard not in excluded
+                    and self.shard_summaries[shard]["max_available"] >= cpu_request
+                    and headroom[shard] >= cpu_request)
+
+        sampled = random.sample(range(self.num_shards), self.sample_size)
+        fitting = [s for s in sampled if fits(s)]
+        if not fitting:
+            # Sampled shards are full; fall back to any shard that looks like it fits
+            fitting = [s for s in range(self.num_shards) if fits(s)]
+        if not fitting:
+            return None
+        # Most headroom balances load; best-fit within the shard still packs its nodes
+        return max(fitting, key=lambda s: headroom[s])
+
+    def schedule_pod(self, pod_id, cpu_request, priority_class=None):
+        """Schedule a single pod, returning its node or None if it was queued"""
+        return self.schedule_pods([(pod_id, cpu_request, priority_class)]).get(pod_id)
+
+    def schedule_pods(self, pods):
+        """Schedule a batch of pods across shards in parallel
+
+        Args:
+            pods: iterable of (pod_id, cpu_request, priority_class) tuples
+
+        Returns:
+            Dictionary mapping pod_ids to their node (or None if the pod is pending)
+        """
+        pods = list(pods)
+        # Validate the whole batch first, so a bad pod neither reaches a shard nor half-applies the batch
+        for pod_id, cpu_request, priority_class in pods:
+            if priority_class is not None and priority_class not in PRIORITY_CLASSES:
+                raise ValueError(f"Unknown priority class: {priority_class}")
+
+        results = {}
+        remaining = []
+        for pod_id, cpu_request, priority_class in pods:
+            if pod_id in self.pod_assignments:
+                results[pod_id] = self.pod_assignments[pod_id]
+                continue
+            self.pod_requests[pod_id] = cpu_request
+            if priority_class is not None or pod_id not in self.pod_priority_classes:
+                self.pod_priority_classes[pod_id] = priority_class
+            remaining.append(pod_id)
+
+        tried = {pod_id: set() for pod_id in remaining}
+
+        while remaining:
+            # Route against the cached shard summaries; pods a shard could not fit are retried elsewhere
+            headroom = [summary["total_available"] for summary in self.shard_summaries]
+            batches = {}
+            unroutable = []
+            for pod_id in remaining:
+                cpu_request = self.pod_requests[pod_id]
+                shard = self._route(cpu_request, headroom, tried[pod_id])
+                if shard is None:
+                    unroutable.append(pod_id)
+                    continue
+                headroom[shard] -= cpu_request
+                tried[pod_id].add(shard)
+                batches.setdefault(shard, []).append((pod_id, cpu_request, self.pod_priority_classes[pod_id]))
+
+            # Send every batch before waiting on any, so the shards work concurrently
+            for shard, batch in batches.items():
+                self._send(shard, "schedule_pods", batch)
+
+            remaining = []
+            errors = []
+            for shard in batches:
+                # Read every reply, even after an error, so no shard is left with an unread message
+                try:
+                    placements = self._receive(shard)
+                except RuntimeError as e:
+                    errors.append(str(e))
+                    continue
+                for pod_id, node_id in placements.items():
+                    if node_id is None:
+                        remaining.append(pod_id)
+                        continue
+                    self.pod_assignments[pod_id] = node_id
+                    self.pod_shards[pod_id] = shard
+                    self.pending_pods.pop(pod_id, None)
+                    results[pod_id] = node_id
+
+            if errors:
+                raise RuntimeError("; ".join(errors))
+
+            for pod_id in unroutable:
+                node_id = self._preempt(pod_id)
+                if node_id is None:
+                    self.pending_pods[pod_id] = self.pod_requests[pod_id]
+                results[pod_id] = node_id
+
+        return results
+
+    def _priority(self, pod_id):
+        return PRIORITY_CLASSES[self.pod_priority_classes.get(pod_id) or DEFAULT_PRIORITY_CLASS]
+
+    def _preempt(self, pod_id):
+        """Place a pod by evicting lower-priority pods in the first shard where that works
+
+        Evicted pods join the front-end pending queue. Returns the node, or None.
+        """
+        if self._priority(pod_id) <= min(PRIORITY_CLASSES.values()):
+            return None  # Nothing ranks below this pod
+        for shard in range(self.num_shards):
+            if not self.shard_summaries[shard]["node_count"]:
+                continue
+            node_id, victims = self._call(
+                shard, "preempt", (pod_id, self.pod_requests[pod_id], self.pod_priority_classes[pod_id])
+            )
+            for victim_id, cpu_request in victims.items():
+                self.pod_assignments.pop(victim_id, None)
+                self.pod_shards.pop(victim_id, None)
+                self.pending_pods[victim_id] = cpu_request
+            if node_id is not None:
+                self.pod_assignments[pod_id] = node_id
+                self.pod_shards[pod_id] = shard
+                self.pending_pods.pop(pod_id, None)
+                return node_id
+        return None
+
+    def unschedule_pod(self, pod_id):
+        """Remove a pod from whichever shard it runs on"""
+        if pod_id not in self.pod_shards:
+            return False
+        shard = self.pod_shards.pop(pod_id)
+        del self.pod_assignments[pod_id]
+        return self._call(shard, "unschedule_pod", pod_id)
+
+    def schedule_pending_pods(self):
+        """Try to place queued pods, highest priority first"""
+        if not self.pending_pods:
+            return {}
+        # Arrival order is kept within a priority
+        pending = sorted(
+            ((pod_id, cpu_request, self.pod_priority_classes.get(pod_id))
+             for pod_id, cpu_request in self.pending_pods.items()),
+            key=lambda pod: -self._priority(pod[0])
+        )
+        return self.schedule_pods(pending)
+
+    def remove_node(self, node_id):
+        """Remove a node and reschedule its pods across all shards"""
+        if node_id not in self.node_shards:
+            return False, f"Node {node_id} does not exist"
+
+        shard = self.node_shards.pop(node_id)
+        displaced = self._call(shard, "deregister_node", node_id)
+        for pod_id in displaced:
+            self.pod_assignments.pop(pod_id, None)
+            self.pod_shards.pop(pod_id, None)
+
+        results = self.schedule_pods(
+            (pod_id, self.pod_requests[pod_id], self.pod_priority_classes.get(pod_id))
+            for pod_id in displaced
+        )
+        rescheduled = sum(1 for node in results.values() if node)
+        return True, f"Node {node_id} removed, rescheduled {rescheduled} of {len(displaced)} pods"
+
+    def get_nodes(self):
+        """Collect the node view of every shard"""
+        for shard in range(self.num_shards):
+            self._send(shard, "nodes")
+        nodes = {}
+        errors = []
+        for shard in range(self.num_shards):
+            try:
+                nodes.update(self._receive(shard))
+            except RuntimeError as e:
+                errors.append(str(e))
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return nodes
+
+    def stop(self):
+        """Shut down all shard processes"""
+        for shard in range(self.num_shards):
+            try:
+                self._call(shard, "stop")
+            except (EOFError, OSError):
+                pass
+        for process in self.processes:
+            process.join(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sharded scheduling throughput")
+    parser.add_argument("--shards", type=int, default=os.cpu_count(), help="Number of scheduler processes")
+    parser.add_argument("--nodes", type=int, default=1000, help="Number of nodes in the cluster")
+    parser.add_argument("--pods", type=int, default=20000, help="Number of pods to schedule")
+    parser.add_argument("--batch", type=int, default=1000, help="Pods submitted per batch")
+    args = parser.parse_args()
+
+    scheduler = ShardedScheduler(num_shards=args.shards)
+    try:
+        for i in range(args.nodes):
+            scheduler.add_node(f"node-{i}", 100)
+
+        pods = [(f"pod-{i}", random.choice([1, 2, 5, 10]), None) for i in range(args.pods)]
+        start = time.time()
+        for i in range(0, len(pods), args.batch):
+            scheduler.schedule_pods(pods[i:i + args.batch])
+        elapsed = time.time() - start
+
+        placed = len(scheduler.pod_assignments)
+        print(f"Shards: {args.shards}, nodes: {args.nodes}")
+        print(f"Placed {placed} pods ({len(scheduler.pending_pods)} pending) in {elapsed:.2f}s "
+              f"= {args.pods / elapsed:.0f} pods/s")
+    finally:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
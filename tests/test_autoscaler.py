@@ -0,0 +1,123 @@
+import time
+
+from autoscaler import estimate_nodes_needed
+from scheduler import Scheduler
+
+
+def make_scheduler(**options):
+    autoscaler_options = {"node_cpu_capacity": 100, "max_nodes": 10, "scale_up_delay": 10, "scale_down_delay": 60,
+                          "scale_up_cooldown": 30, "scale_down_cooldown": 120, "scale_down_repeat_cooldown": 60}
+    autoscaler_options.update(options)
+    scheduler = Scheduler(use_docker=False, autoscaler_options=autoscaler_options)
+    scheduler.add_node("base", 100, labels={"zone": "a"})
+    scheduler.schedule_pod("filler", 100)
+    return scheduler
+
+
+def test_estimate_nodes_needed_packs_best_fit_decreasing():
+    assert estimate_nodes_needed([60, 50, 40, 30, 20], 100) == (2, 0)
+    assert estimate_nodes_needed([10, 10], 100, min_nodes=3) == (3, 0)
+    assert estimate_nodes_needed([150, 100, 1], 100) == (2, 1)
+    assert estimate_nodes_needed([], 100) == (0, 0)
+
+
+def test_scale_up_waits_for_delay_and_cooldown():
+    scheduler = make_scheduler()
+    autoscaler = scheduler.autoscaler
+    for index in range(3):
+        scheduler.schedule_pod(f"p{index}", 60)
+    now = time.time()
+
+    # Pods have not been pending for scale_up_delay yet
+    assert autoscaler.plan_scale_up(now) == 0
+    assert autoscaler.plan_scale_up(now + 11) == 3
+
+    autoscaler.last_scale_up = now + 11
+    assert autoscaler.plan_scale_up(now + 20) == 0
+    assert autoscaler.plan_scale_up(now + 42) == 3
+
+
+def test_scale_up_is_capped_by_max_nodes():
+    scheduler = make_scheduler(max_nodes=3)
+    for index in range(5):
+        scheduler.schedule_pod(f"p{index}", 60)
+
+    assert scheduler.autoscaler.plan_scale_up(time.time() + 11) == 2
+
+
+def test_scale_down_waits_for_delay_and_cooldowns():
+    scheduler = make_scheduler(scale_up_delay=0, scale_down_delay=200)
+    autoscaler = scheduler.autoscaler
+    scheduler.schedule_pod("p0", 60)
+    scheduler.schedule_pod("p1", 60)
+    assert len(autoscaler.run_once()["added"]) == 2
+    added_at = autoscaler.last_scale_up
+
+    scheduler.delete_pod("p0")
+    scheduler.delete_pod("p1")
+    # Seen idle from here on, but still inside the cooldown after the scale-up
+    assert autoscaler.plan_scale_down(added_at + 1) == []
+    # Past the cooldown, but not idle for scale_down_delay yet
+    assert autoscaler.plan_scale_down(added_at + 121) == []
+    first = autoscaler.plan_scale_down(added_at + 202)
+    assert len(first) == 1
+
+    # One node per pass, and the next scale-down waits for scale_down_repeat_cooldown
+    success, _ = scheduler.remove_node(first[0])
+    assert success
+    autoscaler.managed_nodes.discard(first[0])
+    autoscaler.last_scale_down = added_at + 202
+    assert autoscaler.plan_scale_down(added_at + 220) == []
+    second = autoscaler.plan_scale_down(added_at + 263)
+    assert len(second) == 1 and second != first
+
+
+def test_scale_down_is_not_blocked_by_pods_no_new_node_fits():
+    scheduler = make_scheduler(scale_up_delay=0)
+    autoscaler = scheduler.autoscaler
+    scheduler.schedule_pod("p0", 60)
+    autoscaler.run_once()
+    scheduler.delete_pod("p0")
+    scheduler.schedule_pod("huge", 150)
+    now = autoscaler.last_scale_up
+
+    autoscaler.plan_scale_down(now + 1)
+    assert autoscaler.plan_scale_down(now + 121) == ["auto-node-1"]
+
+
+def test_demand_skips_pods_new_nodes_cannot_host():
+    scheduler = make_scheduler(node_labels={"zone": "b"})
+    autoscaler = scheduler.autoscaler
+    scheduler.schedule_pod("selector-a", 10, constraints={"node_selector": {"zone": "a"}})
+    scheduler.schedule_pod("selector-b", 10, constraints={"node_selector": {"zone": "b"}})
+    # Affinity to zone "a", where the group already runs: new zone-b nodes cannot help
+    scheduler.pod_scheduler.schedule_pod("cache-0", 0, constraints={"group": "cache", "affinity": "zone"})
+    scheduler.schedule_pod("cache-1", 10, constraints={"group": "cache", "affinity": "zone"})
+
+    demand, min_nodes = autoscaler._schedulable_demand(time.time() + 11)
+    assert demand == [10]
+    assert min_nodes == 0
+
+
+def test_demand_counts_anti_affinity_per_domain():
+    scheduler = make_scheduler(node_labels={"zone": "b"})
+    autoscaler = scheduler.autoscaler
+    for index in range(3):
+        # All new nodes share zone "b", so only one of these can be placed on them
+        scheduler.schedule_pod(f"web-{index}", 10, constraints={"group": "web", "anti_affinity": "zone"})
+        # Each of these needs a node of its own
+        scheduler.schedule_pod(f"db-{index}", 10, constraints={"group": "db", "anti_affinity": "node"})
+
+    demand, min_nodes = autoscaler._schedulable_demand(time.time() + 11)
+    assert sorted(demand) == [10, 10, 10, 10]
+    assert min_nodes == 3
+    assert autoscaler.plan_scale_up(time.time() + 11) == 3
+
+
+def test_demand_skips_anti_affinity_domains_already_taken():
+    scheduler = make_scheduler(node_labels={"zone": "a"})
+    scheduler.pod_scheduler.schedule_pod("web-0", 0, constraints={"group": "web", "anti_affinity": "zone"})
+    scheduler.schedule_pod("web-1", 10, constraints={"group": "web", "anti_affinity": "zone"})
+
+    # New nodes would be in zone "a", which web-0 already occupies
+    assert scheduler.autoscaler._schedulable_demand(time.time() + 11) == ([], 0)
@@ -0,0 +1,117 @@
+import multiprocessing
+import time
+
+import pytest
+
+import health_monitor
+import heartbeat_agent
+from health_monitor import HealthMonitor
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(health_monitor.time, "time", fake)
+    return fake
+
+
+def silence_until_failed(monitor, node_id, clock, step=0.05):
+    """Return how many seconds after the last heartbeat a node is declared failed"""
+    last = monitor.nodes_health[node_id]
+    elapsed = 0.0
+    while monitor.is_available(node_id, last + elapsed):
+        elapsed += step
+    return elapsed
+
+
+def send_regular_heartbeats(monitor, node_id, clock, count, interval=5.0):
+    for _ in range(count):
+        clock.now += interval
+        monitor.receive_heartbeat(node_id)
+
+
+def test_regular_heartbeats_tolerate_old_timeout_slack(clock):
+    monitor = HealthMonitor(autostart=False)
+    monitor.register_node("n0")
+    send_regular_heartbeats(monitor, "n0", clock, 20)
+
+    # The old fixed timeout allowed 10 s of silence with 5 s heartbeats
+    assert silence_until_failed(monitor, "n0", clock) >= 10.0
+
+
+def test_registration_is_not_an_inter_arrival_sample(clock):
+    monitor = HealthMonitor(autostart=False)
+    monitor.register_node("n0")
+    # The node's first heartbeat arrives right after registration
+    clock.now += 0.01
+    monitor.receive_heartbeat("n0")
+    send_regular_heartbeats(monitor, "n0", clock, 3)
+
+    assert monitor.intervals["n0"].to_list() == [5.0, 5.0, 5.0]
+    assert silence_until_failed(monitor, "n0", clock) < 13.0
+
+
+def test_node_that_never_sends_a_heartbeat_fails_after_timeout(clock):
+    monitor = HealthMonitor(autostart=False)
+    monitor.register_node("n0")
+
+    assert monitor.is_available("n0", clock.now + 9.0)
+    assert not monitor.is_available("n0", clock.now + 10.0)
+
+
+def test_thresholds_can_be_tuned(clock):
+    eager = HealthMonitor(autostart=False, phi_threshold=2.0, acceptable_pause=0.0)
+    relaxed = HealthMonitor(autostart=False)
+    for monitor in (eager, relaxed):
+        monitor.register_node("n0")
+    for _ in range(10):
+        clock.now += 5.0
+        eager.receive_heartbeat("n0")
+        relaxed.receive_heartbeat("n0")
+
+    assert silence_until_failed(eager, "n0", clock) < silence_until_failed(relaxed, "n0", clock)
+
+
+def test_udp_listener_records_registered_nodes_only():
+    rounds = 5
+    registered = [f"node-{i}" for i in range(200)]
+    unregistered = [f"stray-{i}" for i in range(200)]
+    monitor = HealthMonitor(autostart=False)
+    for node_id in registered:
+        monitor.register_node(node_id)
+    host, port = monitor.start_listener(host="127.0.0.1", port=0)
+
+    # The agent runs as a separate local process, like a node container would
+    agent = multiprocessing.Process(
+        target=heartbeat_agent.run, args=(registered + unregistered, host, port, 0.05, True, rounds)
+    )
+    try:
+        agent.start()
+        agent.join(10)
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            with monitor.lock:
+                received = sum(len(monitor.intervals.get(node_id, ())) for node_id in registered)
+            # A node's first heartbeat follows registration, so it adds no interval
+            if received == len(registered) * (rounds - 1):
+                break
+            time.sleep(0.05)
+    finally:
+        monitor.stop()
+
+    assert agent.exitcode == 0
+    for node_id in registered:
+        assert len(monitor.intervals[node_id]) == rounds - 1
+        assert node_id not in monitor.awaiting_first_heartbeat
+    for node_id in unregistered:
+        assert node_id not in monitor.nodes_health
+        assert node_id not in monitor.intervals
+        assert node_id not in monitor.node_usage
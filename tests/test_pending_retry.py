@@ -0,0 +1,49 @@
+from pod_scheduler import PodScheduler
+from scheduler import Scheduler
+
+WEB = {"group": "web", "anti_affinity": "zone"}
+
+
+def test_freed_node_retries_only_pods_that_fit_it():
+    pod_scheduler = PodScheduler()
+    pod_scheduler.register_node("n0", 30)
+    pod_scheduler.register_node("n1", 30)
+    pod_scheduler.schedule_pod("p0", 30)
+    pod_scheduler.schedule_pod("p1", 30)
+    pod_scheduler.schedule_pod("large", 40)
+    pod_scheduler.schedule_pod("small", 20)
+
+    node_id = pod_scheduler.get_node_for_pod("p0")
+    pod_scheduler.delete_pod("p0")
+    results = pod_scheduler.schedule_pending_pods(freed_node=node_id)
+
+    assert results == {"small": {"node": node_id, "status": "scheduled"}}
+    assert "large" in pod_scheduler.pending_pods
+
+
+def test_freed_group_retries_pods_its_constraints_blocked():
+    pod_scheduler = PodScheduler()
+    pod_scheduler.register_node("small", 20, {"zone": "a"})
+    pod_scheduler.register_node("big", 100, {"zone": "a"})
+    assert pod_scheduler.schedule_pod("w1", 20, constraints=WEB) == "small"
+    assert pod_scheduler.schedule_pod("w2", 50, constraints=WEB) is None
+
+    pod_scheduler.delete_pod("w1")
+    # w2 does not fit the freed node, so only knowing w1's group gets it retried
+    assert pod_scheduler.schedule_pending_pods(freed_node="small") == {}
+    # w1 leaving zone "a" lets w2 onto "big"
+    assert pod_scheduler.schedule_pending_pods(freed_node="small", freed_group="web")["w2"]["node"] == "big"
+
+
+def test_deleting_a_grouped_pod_places_pending_pods_of_its_group(capsys):
+    scheduler = Scheduler(use_docker=False)
+    scheduler.add_node("small", 20, labels={"zone": "a"})
+    scheduler.add_node("big", 100, labels={"zone": "a"})
+    assert scheduler.schedule_pod("w1", 20, constraints=WEB) == "small"
+    assert scheduler.schedule_pod("w2", 50, constraints=WEB) is None
+
+    success, _ = scheduler.delete_pod("w1")
+
+    assert success
+    assert scheduler.pod_scheduler.get_node_for_pod("w2") == "big"
+    assert not scheduler.pod_scheduler.pending_pods
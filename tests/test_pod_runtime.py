@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from pod_runtime import PodRuntime
+
+
+class SimulatedNodeManager:
+    """Just the part of NodeManager the runtime reads: nodes without containers"""
+
+    docker_available = False
+
+    def __init__(self, node_ids):
+        self.nodes = {node_id: {"container_id": f"sim-{node_id}"} for node_id in node_ids}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def runtime():
+    runtime = PodRuntime(SimulatedNodeManager(["n0"]), poll_interval=0.02, allow_host_commands=True,
+                         finished_retention=0.2)
+    runtime.start()
+    yield runtime
+    runtime.stop()
+
+
+def test_compound_commands_run_in_full(runtime, tmp_path):
+    runtime.submit("p0", f"echo a > {tmp_path}/a && echo b > {tmp_path}/b; echo c > {tmp_path}/c")
+    runtime.on_placement("bound", "p0", "n0")
+
+    assert wait_for(lambda: runtime.get_pod_status("p0").get("p0", {}).get("status") == "Succeeded")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "b", "c"]
+
+
+def test_finished_records_are_aged_out(runtime):
+    finished = []
+    runtime.add_finish_callback(lambda pod_id, status: finished.append((pod_id, status)))
+    for index in range(20):
+        runtime.submit(f"p{index}", "true")
+        runtime.on_placement("bound", f"p{index}", "n0")
+    runtime.submit("long", "sleep 30")
+    runtime.on_placement("bound", "long", "n0")
+
+    assert wait_for(lambda: len(finished) == 20)
+    # Only the running pod is left to poll, and finished records go once their retention passes
+    assert wait_for(lambda: set(runtime.pods) == {"long"})
+    assert runtime.active == {"long"}
+    assert runtime.get_time_to_running_stats()["count"] == 21
+
+    runtime.terminate("long")
+    assert wait_for(lambda: not runtime.pods)
+    assert not runtime.active
+
+
+def test_terminated_pod_keeps_status_until_retention(runtime):
+    runtime.finished_retention = 60
+    runtime.submit("p0", "sleep 30")
+    runtime.on_placement("bound", "p0", "n0")
+    assert wait_for(lambda: runtime.get_pod_status("p0")["p0"]["status"] == "Running")
+
+    runtime.terminate("p0")
+    assert wait_for(lambda: runtime.get_pod_status("p0")["p0"]["status"] == "Terminated")
+    assert not runtime.active
@@ -0,0 +1,220 @@
+"""Invariant tests for PodScheduler's incremental indexes
+
+The shape cache, topology domain counts and preemption index are all updated
+in place as pods and nodes come and go. These tests drive a scheduler through
+random operations and compare every index with one rebuilt from scratch.
+"""
+import random
+from collections import Counter
+
+import pytest
+
+from pod_scheduler import NODE_TOPOLOGY_KEY, PodScheduler
+
+ZONES = "abcd"
+NODE_COUNT = 24
+CONSTRAINTS = [
+    None,
+    {"group": "web", "anti_affinity": "rack"},
+    {"group": "db", "anti_affinity": NODE_TOPOLOGY_KEY},
+    {"group": "api", "spread": {"topology_key": "zone"}},
+    {"group": "cache", "affinity": "zone"},
+    {"node_selector": {"zone": "b"}},
+]
+
+
+def node_labels(index):
+    return {"zone": ZONES[index % len(ZONES)], "rack": f"r{index % 6}"}
+
+
+def make_scheduler():
+    scheduler = PodScheduler()
+    for index in range(NODE_COUNT):
+        scheduler.register_node(f"n{index}", 100, node_labels(index))
+    return scheduler
+
+
+def check_capacity(scheduler):
+    for node_id, node_info in scheduler.nodes.items():
+        used = sum(scheduler.pod_requests[pod_id] for pod_id in node_info["pods"])
+        assert node_info["cpu_available"] == node_info["cpu_capacity"] - used
+        for pod_id in node_info["pods"]:
+            assert scheduler.pod_assignments[pod_id] == node_id
+    assert not set(scheduler.pod_assignments) & set(scheduler.pending_pods)
+
+
+def check_shape_cache(scheduler):
+    schedulable = {
+        node_id: node_info["cpu_available"]
+        for node_id, node_info in scheduler.nodes.items()
+        if node_id not in scheduler.unschedulable_nodes
+    }
+    assert scheduler.indexed_available == schedulable
+    for cpu_request, candidates in scheduler.shape_cache.items():
+        expected = sorted((available, node_id) for node_id, available in schedulable.items() if available >= cpu_request)
+        assert candidates == expected, cpu_request
+
+
+def check_domain_counts(scheduler):
+    expected = {}
+    expected_domains = {}
+    for pod_id, node_id in scheduler.pod_assignments.items():
+        group = scheduler.pod_constraints.get(pod_id, {}).get("group")
+        if not group:
+            continue
+        domains = [(NODE_TOPOLOGY_KEY, node_id)] + list(scheduler.nodes[node_id]["labels"].items())
+        expected_domains[pod_id] = (group, domains)
+        for topology_key, domain in domains:
+            expected.setdefault(group, {}).setdefault(topology_key, Counter())[domain] += 1
+
+    actual = {}
+    for group, key_counts in scheduler.group_domain_counts.items():
+        for topology_key, counts in key_counts.items():
+            assert all(count > 0 for count in counts.values())
+            if counts:
+                actual.setdefault(group, {})[topology_key] = Counter(counts)
+    assert actual == expected
+    assert scheduler.pod_domains == expected_domains
+
+
+def check_preemption_index(scheduler):
+    assert set(scheduler.preemption_index) == set(scheduler.nodes)
+    expected_holders = {}
+    for node_id, node_info in scheduler.nodes.items():
+        entries = sorted((scheduler.get_pod_priority(pod_id), pod_id) for pod_id in node_info["pods"])
+        assert scheduler.preemption_index[node_id] == entries
+        for priority, _ in entries:
+            holders = expected_holders.setdefault(priority, {})
+            holders[node_id] = holders.get(node_id, 0) + 1
+    assert scheduler.priority_nodes == expected_holders
+
+
+def check_all(scheduler):
+    check_capacity(scheduler)
+    check_shape_cache(scheduler)
+    check_domain_counts(scheduler)
+    check_preemption_index(scheduler)
+
+
+def check_constraints_hold(scheduler):
+    """Placements made through the indexes must still satisfy the constraints"""
+    placed = {}
+    for pod_id, node_id in scheduler.pod_assignments.items():
+        group = scheduler.pod_constraints.get(pod_id, {}).get("group")
+        if group:
+            placed.setdefault(group, []).append(scheduler.nodes[node_id]["labels"])
+    for group, key in (("web", "rack"),):
+        values = [labels[key] for labels in placed.get(group, [])]
+        assert len(values) == len(set(values)), group
+    db_nodes = [
+        node_id for pod_id, node_id in scheduler.pod_assignments.items()
+        if scheduler.pod_constraints.get(pod_id, {}).get("group") == "db"
+    ]
+    assert len(db_nodes) == len(set(db_nodes))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_indexes_match_rebuild_under_random_operations(seed, capsys):
+    rng = random.Random(seed)
+    scheduler = make_scheduler()
+
+    for step in range(1500):
+        pod_id = f"p{rng.randrange(250)}"
+        operation = rng.random()
+        if operation < 0.45:
+            scheduler.schedule_pod(
+                pod_id,
+                rng.choice([5, 10, 20, 40]),
+                priority_class=rng.choice(["batch", "default", "high", "system-critical"]),
+                constraints=rng.choice(CONSTRAINTS),
+            )
+        elif operation < 0.6:
+            scheduler.delete_pod(pod_id)
+        elif operation < 0.65:
+            node_id = scheduler.get_node_for_pod(pod_id)
+            cpu_request = scheduler.pod_requests.get(pod_id)
+            if scheduler.unschedule_pod(pod_id):
+                scheduler.schedule_pending_pods(freed_node=node_id)
+                scheduler.schedule_pod(pod_id, cpu_request)
+        elif operation < 0.72:
+            scheduler.schedule_pending_pods()
+        elif operation < 0.77:
+            index = rng.randrange(NODE_COUNT)
+            node_id = f"n{index}"
+            # A failed node: its pods are rescheduled before it comes back under the same ID
+            requests = dict(scheduler.pod_requests)
+            displaced = scheduler.deregister_node(node_id)
+            scheduler.reschedule_pods({node_id: {pod: requests[pod] for pod in displaced}})
+            check_all(scheduler)
+            scheduler.register_node(node_id, 100, node_labels(index))
+        elif operation < 0.85:
+            scheduler.set_node_schedulable(f"n{rng.randrange(NODE_COUNT)}", rng.random() < 0.6)
+        else:
+            scheduler.assign_pod_to_node(pod_id, f"n{rng.randrange(NODE_COUNT)}")
+
+        check_all(scheduler)
+        check_constraints_hold(scheduler)
+        capsys.readouterr()
+
+
+def test_shape_cache_gives_best_fit_after_evictions():
+    scheduler = PodScheduler()
+    scheduler.shape_cache_size = 2
+    for index, capacity in enumerate([30, 50, 70, 90]):
+        scheduler.register_node(f"n{index}", capacity)
+
+    # Use more shapes than the cache holds so some are rebuilt from indexed_available
+    for pod_index, cpu_request in enumerate([20, 40, 10, 20, 5, 40, 10]):
+        node_id = scheduler.schedule_pod(f"p{pod_index}", cpu_request)
+        check_shape_cache(scheduler)
+        assert len(scheduler.shape_cache) <= scheduler.shape_cache_size
+        if node_id is not None:
+            # Best fit: no other schedulable node had less room left that still fit
+            left = scheduler.nodes[node_id]["cpu_available"] + cpu_request
+            tighter = [
+                node_info["cpu_available"] for other, node_info in scheduler.nodes.items()
+                if other != node_id and cpu_request <= node_info["cpu_available"] < left
+            ]
+            assert not tighter
+
+
+def test_cordoned_node_leaves_and_rejoins_shape_cache():
+    scheduler = make_scheduler()
+    scheduler.schedule_pod("p0", 10)
+    scheduler.set_node_schedulable("n3", False)
+    check_shape_cache(scheduler)
+    assert all(node_id != "n3" for _, node_id in scheduler._candidates_for(10))
+
+    scheduler.set_node_schedulable("n3", True)
+    check_shape_cache(scheduler)
+    assert any(node_id == "n3" for _, node_id in scheduler._candidates_for(10))
+
+
+def test_preemption_only_considers_nodes_with_lower_priority_pods():
+    scheduler = PodScheduler()
+    scheduler.register_node("n0", 40)
+    scheduler.register_node("n1", 40)
+    scheduler.schedule_pod("high-0", 40, priority_class="high")
+    scheduler.schedule_pod("batch-0", 40, priority_class="batch")
+    assert scheduler.priority_nodes == {100: {"n0": 1}, -100: {"n1": 1}}
+
+    # A default pod can only displace the batch pod
+    assert scheduler.schedule_pod("default-0", 40) == "n1"
+    assert "batch-0" in scheduler.pending_pods
+    check_all(scheduler)
+
+    # Nothing below default priority is running any more, so preemption finds no node
+    assert scheduler.schedule_pod("default-1", 40) is None
+    assert "default-1" in scheduler.pending_pods
+    check_all(scheduler)
+
+
+def test_deregister_drops_node_from_priority_index():
+    scheduler = make_scheduler()
+    for index in range(6):
+        scheduler.schedule_pod(f"p{index}", 60, priority_class="batch")
+    node_id = scheduler.get_node_for_pod("p0")
+
+    scheduler.deregister_node(node_id)
+    assert all(node_id not in holders for holders in scheduler.priority_nodes.values())
+    assert node_id not in scheduler.preemption_index
@@ -0,0 +1,76 @@
+import pytest
+
+from pod_scheduler import PodScheduler
+from usage_collector import FakeStatsSource, UsageCollector
+
+
+class StaticNodeManager:
+    """Just the part of NodeManager the collector reads"""
+
+    def __init__(self, node_ids):
+        self.nodes = {node_id: {"container_id": f"container-{node_id}"} for node_id in node_ids}
+
+    def list_nodes(self):
+        return self.nodes
+
+
+@pytest.fixture
+def cluster():
+    node_manager = StaticNodeManager(["a", "b"])
+    stats_source = FakeStatsSource()
+    collector = UsageCollector(node_manager, stats_source, window_size=3)
+    pod_scheduler = PodScheduler()
+    for node_id in node_manager.nodes:
+        pod_scheduler.register_node(node_id, 100)
+    pod_scheduler.set_usage_provider(collector.get_cpu_usage)
+    return node_manager, stats_source, collector, pod_scheduler
+
+
+def test_collect_once_keeps_a_window_per_node(cluster):
+    node_manager, stats_source, collector, _ = cluster
+    for cpu in (10, 20, 30, 40):
+        stats_source.set_usage("container-a", cpu, memory=cpu * 1000)
+        collector.collect_once()
+
+    # Only the last window_size samples count
+    assert collector.get_cpu_usage("a") == 30
+    assert collector.get_usage_summary()["a"]["memory_last"] == 40000
+    # A node without samples is unmeasured rather than idle
+    assert collector.get_cpu_usage("b") is None
+
+    del node_manager.nodes["a"]
+    collector.collect_once()
+    assert collector.get_cpu_usage("a") is None
+    assert "a" not in collector.get_usage_summary()
+
+
+def test_usage_aware_placement_avoids_hot_nodes(cluster):
+    _, stats_source, collector, pod_scheduler = cluster
+    # "a" runs hotter than its (zero) requests; by requests alone it would be picked first
+    stats_source.set_usage("container-a", 90)
+    stats_source.set_usage("container-b", 10)
+    collector.collect_once()
+
+    assert pod_scheduler.schedule_pod("p0", 20) == "b"
+
+
+def test_usage_aware_placement_packs_on_measured_headroom(cluster):
+    _, stats_source, collector, pod_scheduler = cluster
+    stats_source.set_usage("container-a", 50)
+    stats_source.set_usage("container-b", 10)
+    collector.collect_once()
+
+    # Both fit; "a" leaves the least measured headroom
+    assert pod_scheduler.schedule_pod("p0", 40) == "a"
+
+
+def test_usage_aware_placement_falls_back_to_requests(cluster):
+    _, stats_source, collector, pod_scheduler = cluster
+    stats_source.set_usage("container-a", 95)
+    stats_source.set_usage("container-b", 95)
+    collector.collect_once()
+
+    # No node has the measured headroom, so best-fit on requests decides
+    assert pod_scheduler.schedule_pod("p0", 20) == "a"
+    assert pod_scheduler.schedule_pod("p1", 70) == "a"
+    assert pod_scheduler.schedule_pod("p2", 20) == "b"
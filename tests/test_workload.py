@@ -0,0 +1,47 @@
+import argparse
+import json
+
+import workload
+from node_manager import NodeManager
+
+
+def write_trace(path, **options):
+    events = workload.generate_synthetic_trace(duration=120, arrival_rate=2, mean_duration=30,
+                                               node_ids=["node-0", "node-1", "node-2"], seed=1, **options)
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+def test_node_manager_without_docker_simulates_nodes():
+    node_manager = NodeManager(use_docker=False)
+    assert not node_manager.docker_available
+    assert node_manager.client is None
+
+    node_manager.add_node("n0", 100)
+    assert node_manager.nodes["n0"]["container_id"].startswith("sim-")
+
+
+def test_replay_uses_simulated_nodes_and_removes_them(tmp_path, monkeypatch, capsys):
+    trace_path = tmp_path / "trace.jsonl"
+    report_path = tmp_path / "report.json"
+    write_trace(trace_path, node_failure_rate=0.01)
+
+    created = []
+    original_init = NodeManager.__init__
+
+    def record_node_manager(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        created.append(self)
+
+    monkeypatch.setattr(NodeManager, "__init__", record_node_manager)
+    args = argparse.Namespace(trace=str(trace_path), nodes=3, cpu=100, speedup=0, sample_interval=10.0,
+                              report=str(report_path), verbose=False)
+    workload.replay_command(args)
+
+    node_manager, = created
+    assert node_manager.client is None
+    assert node_manager.list_nodes() == {}
+    report = json.loads(report_path.read_text())
+    assert report["events"]["pod_arrival"] > 0
+    assert report["events"]["placed"] > 0
@@ -0,0 +1,137 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock
+from node_manager import CPU_UNITS_PER_CORE
+from ring_buffer import RingBuffer
+
+
+class DockerStatsSource:
+    """Reads CPU and memory usage of node containers from the Docker stats API"""
+
+    def __init__(self, client, max_workers=16):
+        self.client = client
+        # A one-shot stats call blocks for about a second while Docker takes two CPU readings,
+        # so containers are sampled concurrently
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def sample(self, container_ids):
+        """Return {container_id: {"cpu": CPU units in use, "memory": bytes}} for running containers"""
+        # Simulated nodes have no container to read
+        container_ids = [cid for cid in container_ids if not cid.startswith("sim-")]
+        results = {}
+        for container_id, usage in zip(container_ids, self.executor.map(self._sample_one, container_ids)):
+            if usage is not None:
+                results[container_id] = usage
+        return results
+
+    def _sample_one(self, container_id):
+        try:
+            stats = self.client.api.stats(container_id, stream=False)
+        except Exception as e:
+            print(f"Error reading stats for container {container_id[:12]}: {e}")
+            return None
+
+        cpu_stats = stats.get("cpu_stats", {})
+        precpu_stats = stats.get("precpu_stats", {})
+        cpu_delta = cpu_stats.get("cpu_usage", {}).get("total_usage", 0) - \
+            precpu_stats.get("cpu_usage", {}).get("total_usage", 0)
+        system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get("system_cpu_usage", 0)
+        online_cpus = cpu_stats.get("online_cpus") or 1
+
+        cores_used = cpu_delta / system_delta * online_cpus if system_delta > 0 else 0.0
+        return {
+            "cpu": cores_used * CPU_UNITS_PER_CORE,
+            "memory": stats.get("memory_stats", {}).get("usage", 0)
+        }
+
+
+class FakeStatsSource:
+    """Stats source for tests and simulations; usage is set by hand"""
+
+    def __init__(self):
+        self.usage = {}  # {container_id: {"cpu": ..., "memory": ...}}
+
+    def set_usage(self, container_id, cpu, memory=0):
+        self.usage[container_id] = {"cpu": cpu, "memory": memory}
+
+    def sample(self, container_ids):
+        return {cid: self.usage[cid] for cid in container_ids if cid in self.usage}
+
+
+class UsageCollector:
+    """Background sampler keeping a short CPU/memory time series per node"""
+
+    def __init__(self, node_manager, stats_source=None, interval=5, window_size=60):
+        self.node_manager = node_manager
+        self.stats_source = stats_source
+        self.interval = interval  # seconds between samples
+        self.window_size = window_size  # samples kept per node
+        self.cpu_usage = {}  # {node_id: RingBuffer of CPU units in use}
+        self.memory_usage = {}  # {node_id: RingBuffer of bytes in use}
+        self.lock = Lock()
+        self.running = False
+        self.collector_thread = None
+
+    def start(self):
+        """Start sampling in the background (a no-op without a stats source)"""
+        if self.running or self.stats_source is None:
+            return
+        self.running = True
+        self.collector_thread = Thread(target=self._collect_loop, daemon=True)
+        self.collector_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.collector_thread:
+            self.collector_thread.join(1)
+
+    def _collect_loop(self):
+        while self.running:
+            try:
+                self.collect_once()
+            except Exception as e:
+                print(f"Error collecting usage: {e}")
+            time.sleep(self.interval)
+
+    def collect_once(self):
+        """Sample every node container in one bulk call and record the results"""
+        nodes = self.node_manager.list_nodes()
+        container_to_node = {node_info["container_id"]: node_id for node_id, node_info in list(nodes.items())}
+        samples = self.stats_source.sample(list(container_to_node))
+
+        with self.lock:
+            for container_id, usage in samples.items():
+                node_id = container_to_node[container_id]
+                if node_id not in self.cpu_usage:
+                    self.cpu_usage[node_id] = RingBuffer(self.window_size)
+                    self.memory_usage[node_id] = RingBuffer(self.window_size)
+                self.cpu_usage[node_id].append(usage["cpu"])
+                self.memory_usage[node_id].append(usage["memory"])
+
+            # Forget nodes that have been removed
+            for node_id in list(self.cpu_usage):
+                if node_id not in nodes:
+                    del self.cpu_usage[node_id]
+                    del self.memory_usage[node_id]
+
+        return samples
+
+    def get_cpu_usage(self, node_id):
+        """Return the average CPU units a node used over the window, or None if unmeasured"""
+        window = self.cpu_usage.get(node_id)
+        if window is None or not len(window):
+            return None
+        return window.mean()
+
+    def get_usage_summary(self):
+        """Return mean and latest usage per measured node"""
+        with self.lock:
+            return {
+                node_id: {
+                    "cpu_mean": self.cpu_usage[node_id].mean(),
+                    "cpu_last": self.cpu_usage[node_id].last(),
+                    "memory_mean": self.memory_usage[node_id].mean(),
+                    "memory_last": self.memory_usage[node_id].last()
+                }
+                for node_id in self.cpu_usage
+            }
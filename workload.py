@@ -0,0 +1,349 @@
+import argparse
+import contextlib
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import time
+
+
+def read_trace(path):
+    """Lazily yield events from a JSONL trace file, one dictionary per line
+
+    Each event has a time "t" in seconds from the start of the trace and a "type":
+        {"t": 0.5, "type": "pod_arrival", "pod_id": "p1", "cpu_request": 10,
+         "priority_class": "default", "duration": 60}
+        {"t": 60.5, "type": "pod_departure", "pod_id": "p1"}
+        {"t": 90, "type": "node_failure", "node_id": "node-3"}
+        {"t": 120, "type": "node_add", "node_id": "node-9", "cpu_capacity": 100}
+    Blank lines and lines starting with # are skipped.
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            yield json.loads(line)
+
+
+def _cpu_sampler(distribution, mean_cpu, max_cpu):
+    """Return a function drawing CPU requests from the given distribution"""
+    if distribution == "constant":
+        return lambda: mean_cpu
+    if distribution == "uniform":
+        return lambda: random.randint(1, max(1, 2 * mean_cpu - 1))
+    if distribution == "pareto":
+        # Heavy-tailed: most pods are small, a few are very large
+        alpha = 1.5
+        scale = mean_cpu * (alpha - 1) / alpha
+        return lambda: min(max_cpu, max(1, int(round(scale * random.paretovariate(alpha)))))
+    if distribution == "exponential":
+        return lambda: min(max_cpu, max(1, int(round(random.expovariate(1.0 / mean_cpu)))))
+    raise ValueError(f"Unknown CPU distribution: {distribution}")
+
+
+def generate_synthetic_trace(duration, arrival_rate, cpu_distribution="exponential", mean_cpu=10, max_cpu=100,
+                             mean_duration=None, priority_mix=None, node_ids=(), node_failure_rate=0.0, seed=None):
+    """Lazily yield a time-ordered synthetic trace
+
+    Args:
+        duration: length of the trace in seconds
+        arrival_rate: mean pod arrivals per second (Poisson process)
+        cpu_distribution: "constant", "uniform", "exponential" or "pareto"
+        mean_duration: mean pod lifetime in seconds (exponential); None means pods never leave
+        priority_mix: optional {priority_class: weight}
+        node_ids: nodes that may fail
+        node_failure_rate: mean node failures per second (Poisson process)
+    """
+    if seed is not None:
+        random.seed(seed)
+    draw_cpu = _cpu_sampler(cpu_distribution, mean_cpu, max_cpu)
+    priority_classes = list(priority_mix) if priority_mix else None
+    priority_weights = list(priority_mix.values()) if priority_mix else None
+    alive_nodes = list(node_ids)
+
+    departures = []  # Heap of (time, pod_id) still to be emitted
+    next_failure = random.expovariate(node_failure_rate) if node_failure_rate > 0 else math.inf
+    t = 0.0
+    pod_number = 0
+
+    while True:
+        t += random.expovariate(arrival_rate)
+
+        # Emit anything due before this arrival so the trace stays ordered
+        while True:
+            next_departure = departures[0][0] if departures else math.inf
+            if min(next_departure, next_failure) > min(t, duration):
+                break
+            if next_departure <= next_failure:
+                departure_time, pod_id = heapq.heappop(departures)
+                yield {"t": round(departure_time, 6), "type": "pod_departure", "pod_id": pod_id}
+            else:
+                if alive_nodes:
+                    node_id = alive_nodes.pop(random.randrange(len(alive_nodes)))
+                    yield {"t": round(next_failure, 6), "type": "node_failure", "node_id": node_id}
+                next_failure += random.expovariate(node_failure_rate)
+
+        if t > duration:
+            break
+
+        event = {"t": round(t, 6), "type": "pod_arrival", "pod_id": f"pod-{pod_number}", "cpu_request": draw_cpu()}
+        if priority_classes:
+            event["priority_class"] = random.choices(priority_classes, priority_weights)[0]
+        if mean_duration:
+            event["duration"] = round(random.expovariate(1.0 / mean_duration), 6)
+            heapq.heappush(departures, (t + event["duration"], event["pod_id"]))
+        pod_number += 1
+        yield event
+
+
+class TraceReplayer:
+    """Replays a workload trace through a Scheduler and records how the cluster copes
+
+    Trace time is compressed by the speedup factor (a speedup of 0 replays as
+    fast as possible). Every sample_interval seconds of trace time the
+    replayer records pending-queue depth, CPU utilisation and throughput.
+    Nodes have no heartbeat threads during a replay, so the replayer sends
+    their heartbeats itself every heartbeat_interval seconds of wall time.
+    """
+
+    def __init__(self, scheduler, speedup=100.0, sample_interval=10.0, heartbeat_interval=1.0):
+        self.scheduler = scheduler
+        self.speedup = speedup
+        self.sample_interval = sample_interval  # seconds of trace time
+        self.heartbeat_interval = heartbeat_interval  # seconds of wall time
+        self.last_heartbeat = 0.0
+        self.placement_latencies = []  # Wall-clock seconds per pod arrival
+        self.trace_time = 0.0
+        self.queued_at = {}  # {pod_id: trace time} for arriving pods that had to wait
+        self.queue_waits = []  # Trace seconds queued arrivals waited before being placed
+        scheduler.pod_scheduler.add_placement_listener(self._on_placement)
+        self.samples = []
+        self.counts = {"pod_arrival": 0, "pod_departure": 0, "node_failure": 0, "node_add": 0,
+                       "placed": 0, "queued": 0}
+
+    def replay(self, events):
+        """Replay an iterable of events and return the summary report"""
+        start_wall = time.time()
+        next_sample = 0.0
+        last_sample_wall = start_wall
+        last_sample_arrivals = 0
+        trace_time = 0.0
+
+        for event in events:
+            trace_time = event["t"]
+            self.trace_time = trace_time
+
+            while trace_time >= next_sample:
+                now = time.time()
+                self._sample(next_sample, now - last_sample_wall, self.counts["pod_arrival"] - last_sample_arrivals)
+                last_sample_wall = now
+                last_sample_arrivals = self.counts["pod_arrival"]
+                next_sample += self.sample_interval
+
+            if self.speedup:
+                self._wait_until(start_wall + trace_time / self.speedup)
+
+            self._keep_alive()
+            self._apply(event)
+
+        now = time.time()
+        self._sample(trace_time, now - last_sample_wall, self.counts["pod_arrival"] - last_sample_arrivals)
+        return self.report(now - start_wall, trace_time)
+
+    def _apply(self, event):
+        event_type = event["type"]
+        if event_type == "pod_arrival":
+            started = time.time()
+            node_id = self.scheduler.schedule_pod(event["pod_id"], event["cpu_request"], event.get("priority_class"))
+            self.placement_latencies.append(time.time() - started)
+            self.counts["placed" if node_id else "queued"] += 1
+            if not node_id:
+                self.queued_at[event["pod_id"]] = self.trace_time
+        elif event_type == "pod_departure":
+            self.queued_at.pop(event["pod_id"], None)
+            self.scheduler.complete_pod(event["pod_id"])
+        elif event_type == "node_failure":
+            self.scheduler.remove_node(event["node_id"])
+        elif event_type == "node_add":
+            self.scheduler.add_node(event["node_id"], event.get("cpu_capacity", 100))
+        else:
+            print(f"Ignoring unknown trace event type {event_type}", file=sys.stderr)
+            return
+        self.counts[event_type] += 1
+
+    def _on_placement(self, event, pod_id, node_id):
+        """Placement listener measuring queue wait in trace time, which is what a speedup preserves"""
+        if event == "bound" and pod_id in self.queued_at:
+            self.queue_waits.append(self.trace_time - self.queued_at.pop(pod_id))
+
+    def _wait_until(self, deadline):
+        """Sleep until a wall-clock deadline, keeping nodes alive on the way"""
+        while True:
+            delay = deadline - time.time()
+            if delay <= 0:
+                return
+            time.sleep(min(delay, self.heartbeat_interval))
+            self._keep_alive()
+
+    def _keep_alive(self):
+        """Send a heartbeat for every node if one is due"""
+        now = time.time()
+        if now - self.last_heartbeat < self.heartbeat_interval:
+            return
+        self.last_heartbeat = now
+        nodes = list(self.scheduler.pod_scheduler.nodes)
+        self.scheduler.health_manager.get_health_monitor().receive_heartbeats((node_id, None) for node_id in nodes)
+
+    def _sample(self, trace_time, wall_elapsed, arrivals):
+        nodes = self.scheduler.pod_scheduler.nodes
+        capacity = sum(node_info["cpu_capacity"] for node_info in nodes.values())
+        available = sum(node_info["cpu_available"] for node_info in nodes.values())
+
+        self.samples.append({
+            "t": trace_time,
+            "nodes": len(nodes),
+            "pending": len(self.scheduler.pod_scheduler.pending_pods),
+            "utilisation": (capacity - available) / capacity if capacity else 0.0,
+            "throughput": arrivals / wall_elapsed if wall_elapsed > 0 else 0.0
+        })
+
+    def report(self, wall_time, trace_time):
+        latencies = sorted(self.placement_latencies)
+
+        def percentile(p):
+            return latencies[int(p * (len(latencies) - 1))] if latencies else 0.0
+
+        utilisation = [sample["utilisation"] for sample in self.samples]
+        waits = sorted(self.queue_waits)
+        still_waiting = [trace_time - queued_at for queued_at in self.queued_at.values()]
+        return {
+            "trace_seconds": trace_time,
+            "wall_seconds": wall_time,
+            "events": dict(self.counts),
+            "throughput_pods_per_second": self.counts["pod_arrival"] / wall_time if wall_time > 0 else 0.0,
+            "placement_latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p50": percentile(0.50),
+                "p99": percentile(0.99),
+                "max": latencies[-1] if latencies else 0.0
+            },
+            "pending": {
+                "final": len(self.scheduler.pod_scheduler.pending_pods),
+                "max": max((sample["pending"] for sample in self.samples), default=0)
+            },
+            "utilisation": {
+                "mean": sum(utilisation) / len(utilisation) if utilisation else 0.0,
+                "max": max(utilisation, default=0.0)
+            },
+            # Trace seconds between a queued pod's arrival and its placement
+            "queue_wait": {
+                "placed": len(waits),
+                "mean": sum(waits) / len(waits) if waits else 0.0,
+                "p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "max": waits[-1] if waits else 0.0,
+                "never_placed": len(still_waiting),
+                "never_placed_max": max(still_waiting, default=0.0)
+            },
+            "samples": self.samples
+        }
+
+
+def generate_command(args):
+    priority_mix = None
+    if args.priority_mix:
+        priority_mix = {}
+        for item in args.priority_mix.split(","):
+            name, weight = item.split("=")
+            priority_mix[name] = float(weight)
+
+    events = generate_synthetic_trace(
+        duration=args.duration,
+        arrival_rate=args.rate,
+        cpu_distribution=args.cpu_dist,
+        mean_cpu=args.mean_cpu,
+        max_cpu=args.max_cpu,
+        mean_duration=args.mean_duration,
+        priority_mix=priority_mix,
+        node_ids=[f"node-{i}" for i in range(args.nodes)],
+        node_failure_rate=args.node_failure_rate,
+        seed=args.seed
+    )
+    for event in events:
+        sys.stdout.write(json.dumps(event) + "\n")
+
+
+def replay_command(args):
+    # Imported here so generating traces does not need Docker or Flask installed
+    from scheduler import Scheduler
+
+    # Capacity planning only needs the scheduler's bookkeeping; never start real containers
+    scheduler = Scheduler(use_docker=False)
+    replayer = TraceReplayer(scheduler, speedup=args.speedup, sample_interval=args.sample_interval)
+    try:
+        # The scheduler logs every placement; keep the report readable unless asked for it
+        log = sys.stdout if args.verbose else open(os.devnull, "w")
+        with contextlib.redirect_stdout(log):
+            for i in range(args.nodes):
+                scheduler.add_node(f"node-{i}", args.cpu)
+            report = replayer.replay(read_trace(args.trace))
+    finally:
+        scheduler.stop()
+        # Drop the nodes the replay created so nothing it made outlives it
+        for node_id in list(scheduler.node_manager.list_nodes()):
+            scheduler.node_manager.remove_node(node_id)
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    summary = {key: value for key, value in report.items() if key != "samples"}
+    print(json.dumps(summary, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and replay workload traces for capacity planning")
+    subparsers = parser.add_subparsers(dest="command", help="Command to execute")
+
+    gen_parser = subparsers.add_parser("generate", help="Write a synthetic JSONL trace to stdout")
+    gen_parser.add_argument("--duration", type=float, default=3600, help="Trace length in seconds (default: 3600)")
+    gen_parser.add_argument("--rate", type=float, default=1.0, help="Pod arrivals per second (default: 1)")
+    gen_parser.add_argument("--cpu-dist", default="exponential",
+                            choices=["constant", "uniform", "exponential", "pareto"],
+                            help="CPU request distribution (default: exponential)")
+    gen_parser.add_argument("--mean-cpu", type=int, default=10, help="Mean CPU request (default: 10)")
+    gen_parser.add_argument("--max-cpu", type=int, default=100, help="Largest CPU request (default: 100)")
+    gen_parser.add_argument("--mean-duration", type=float, default=None,
+                            help="Mean pod lifetime in seconds (default: pods never leave)")
+    gen_parser.add_argument("--priority-mix", default=None,
+                            help="Priority class weights, e.g. high=1,default=8,batch=1")
+    gen_parser.add_argument("--nodes", type=int, default=0, help="Nodes named node-<n> that may fail")
+    gen_parser.add_argument("--node-failure-rate", type=float, default=0.0,
+                            help="Node failures per second (default: 0)")
+    gen_parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay a trace through the scheduler")
+    replay_parser.add_argument("trace", help="Path to a JSONL trace")
+    replay_parser.add_argument("--nodes", type=int, default=10, help="Initial nodes named node-<n> (default: 10)")
+    replay_parser.add_argument("--cpu", type=int, default=100, help="CPU capacity per node (default: 100)")
+    replay_parser.add_argument("--speedup", type=float, default=0,
+                               help="Trace seconds per wall second, 0 for as fast as possible (default: 0)")
+    replay_parser.add_argument("--sample-interval", type=float, default=10.0,
+                               help="Trace seconds between metric samples (default: 10)")
+    replay_parser.add_argument("--report", default=None, help="Write the full report with time series as JSON")
+    replay_parser.add_argument("--verbose", action="store_true", help="Show scheduler logs")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_command(args)
+    elif args.command == "replay":
+        replay_command(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()